@@ -1,107 +1,567 @@
-"""This file defines the API routes."""
+"""This file defines the API routes and the factory that builds the app.
 
-# pylint: disable = no-name-in-module
-
-from datetime import datetime, date
-
-from flask import Flask, request, jsonify
+Importing this module is cheap: the default app, configured from the
+environment, is only built when `app` (or its `app_history`,
+`response_cache` or `app_metrics`) is first used. Optional subsystems
+are only imported when they are enabled."""
 
-from date_functions import (convert_to_datetime, get_day_of_week_on,
-                            get_days_between, get_current_age)
-
-app_history = []
+# pylint: disable = no-name-in-module
 
-app = Flask(__name__)
+import json
+from collections.abc import Mapping
+from functools import lru_cache
+from os import environ
+from threading import Lock
+from time import time
+
+from flask import Flask, Response, current_app, g, request, stream_with_context, url_for
+
+from business_days import Calendars, HolidayCalendar, HOLIDAY_DIR, DEFAULT_CALENDAR
+from date_functions import (convert_to_datetime, convert_all_to_datetime,
+                            get_day_of_week_on, get_days_between,
+                            get_current_age, convert_to_date, next_midnight,
+                            get_zone, in_zone, format_date, get_range_summary,
+                            iter_dates, parse_instant, DateParser, current_parser,
+                            date_parser)
+from history import open_history, BUCKETS, DEFAULT_CAPACITY
+from json_provider import init_json
+from metrics import Metrics, init_metrics, CONTENT_TYPE
+from msgpack_format import init_msgpack, json_to_msgpack, packb, MIMETYPE as MSGPACK
+from response_cache import ResponseCache, DEFAULT_SIZE
+from single_flight import SingleFlight
+from validation import (Schema, BETWEEN, WEEKDAY, BETWEEN_ITEM, WEEKDAY_ITEM,
+                        BUSINESS_DAYS, ADD_BUSINESS_DAYS, HISTORY, CURRENT_AGE, INVALID_TIME)
+
+MAX_BATCH_SIZE = 100_000
+BULK_FORMATS = ("application/x-ndjson", "application/jsonl", "text/csv")
+# Request options that change the answers of the working day routes
+CALENDAR_OPTIONS = ("tz", "calendar")
+# History query parameters answered from the history's indexes
+HISTORY_FILTERS = ("route", "method", "since", "until", "cursor", "aggregate")
+# Answers for fixed dates never change, so clients may keep them for a day
+CACHE_MAX_AGE = 86400
+
+# Fixed response bodies, encoded once
+WELCOME = json.dumps({"message": "Welcome to the Days API."}, separators=(",", ":")).encode()
+
+ROUTES = []
+DEFAULT_APP_NAMES = ("app", "app_history", "response_cache", "app_metrics")
+default_app_lock = Lock()
+
+
+def api_route(rule: str, methods: list[str]):
+    """Returns a decorator that adds a view to the routes of every app."""
+    def register(view):
+        ROUTES.append((rule, methods, view))
+        return view
+    return register
+
+
+def create_app(config: Mapping[str, str] | None = None, history_store=None) -> Flask:
+    """Returns a new app configured from a mapping of settings, which
+    defaults to the environment, using history_store for its history if given."""
+    config = environ if config is None else config
+    app = Flask(__name__)
+
+    if history_store is None:
+        backend = config.get("HISTORY_BACKEND", "memory")
+        history_store = open_history(backend,
+                                     int(config.get("HISTORY_CAPACITY", DEFAULT_CAPACITY)),
+                                     config.get("HISTORY_DIR" if backend == "log"
+                                                else "HISTORY_FILE"))
+    app.extensions["history"] = history_store
+    app.extensions["response_cache"] = ResponseCache(
+        int(config.get("RESPONSE_CACHE_SIZE", DEFAULT_SIZE)))
+    app.extensions["metrics"] = Metrics()
+    app.extensions["calendars"] = Calendars(config.get("HOLIDAY_DIR", HOLIDAY_DIR))
+    app.config["HOLIDAY_CALENDAR"] = config.get("HOLIDAY_CALENDAR", DEFAULT_CALENDAR)
+    app.config["HISTORY_ON_CACHE_HIT"] = config.get("HISTORY_ON_CACHE_HIT", "1") != "0"
+
+    init_json(app, config.get("JSON_PROVIDER", "fast"))
+    init_msgpack(app)
+
+    if config.get("COALESCE_REQUESTS", "1") != "0":
+        app.extensions["single_flight"] = SingleFlight()
+        app.teardown_request(land_flight)
+
+    app.extensions["date_parser"] = date_parser
+    if config.get("DATE_FORMATS"):
+        app.extensions["date_parser"] = DateParser(
+            tuple(name.strip() for name in config["DATE_FORMATS"].split(",")))
+        app.before_request(use_date_parser)
+        app.teardown_request(drop_date_parser)
+
+    if config.get("METRICS_ENABLED", "1") != "0":
+        init_metrics(app, app.extensions["metrics"])
+
+    if config.get("RATE_LIMITS"):
+        # pylint: disable = import-outside-toplevel
+        from rate_limit import init_rate_limits, parse_limits, parse_api_keys
+        init_rate_limits(app, parse_limits(config["RATE_LIMITS"]),
+                         config.get("RATE_LIMIT_FILE"),
+                         parse_api_keys(config.get("API_KEYS", "")))
+
+    if config.get("PROFILING_ENABLED", "0") != "0":
+        # pylint: disable = import-outside-toplevel
+        from request_profiling import ProfileStore, init_profiling
+        init_profiling(app, ProfileStore(int(config.get("PROFILE_STORE_SIZE", 100))),
+                       float(config.get("PROFILE_SAMPLE_RATE", 0)),
+                       config.get("PROFILE_TOKEN"))
+
+    for rule, methods, view in ROUTES:
+        app.add_url_rule(rule, view_func=view, methods=methods)
+    return app
+
+
+def __getattr__(name: str):
+    """Builds the default app, configured from the environment, on first use."""
+    if name not in DEFAULT_APP_NAMES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with default_app_lock:
+        if "app" not in globals():
+            default = create_app()
+            globals().update(app=default,
+                             app_history=default.extensions["history"],
+                             response_cache=default.extensions["response_cache"],
+                             app_metrics=default.extensions["metrics"])
+    return globals()[name]
 
 
 def add_to_history(current_request):
     """Adds a route to the app history."""
-    app_history.append({
-        "method": current_request.method,
-        "at": datetime.now().strftime("%d/%m/%Y %H:%M"),
-        "route": current_request.endpoint
-    })
-
-
-@app.get("/")
+    current_app.extensions["history"].append(current_request.method,
+                                             current_request.endpoint)
+
+
+def json_body(body: bytes, status: int = 200) -> Response:
+    """Returns a response for an already-encoded JSON body, re-encoded as
+    MessagePack if the client prefers it."""
+    if request.wants_msgpack:
+        return Response(json_to_msgpack(body), status, mimetype=MSGPACK)
+    return Response(body, status, mimetype="application/json")
+
+
+@lru_cache(maxsize=64)
+def error_body(message: str) -> bytes:
+    """Returns the JSON body for an error message, encoded once."""
+    return json.dumps({"error": message}, separators=(",", ":")).encode()
+
+
+def rejected(schema: Schema, data, record: bool = True) -> Response | None:
+    """Returns a 400 response if data does not match schema, recording the
+    request in the history unless the route already has."""
+    error = schema.validate(data)
+    if error is None:
+        return None
+    if record:
+        add_to_history(request)
+    return json_body(error_body(error), 400)
+
+
+def cache_key(route: str, data: dict, *fields: str, options: tuple[str, ...] = ("tz",)) -> tuple:
+    """Returns the response cache key for a request's fields, the options
+    the route uses, such as its time zone, and the response format.
+
+    Options are keyed as given, strings or None as checked by the route's
+    schema, so that a missing option and the name "None" differ."""
+    return (route, *(str(data[field]) for field in fields),
+            *(data.get(option) for option in options), request.wants_msgpack)
+
+
+def cache_lookup(key: tuple | None):
+    """Returns the cached response for key, if any, and records the request
+    in the history unless it is a cache hit that should not be recorded.
+
+    On a miss, if an identical request is already being answered, waits to
+    share its response; otherwise this request leads until it lands."""
+    entry = current_app.extensions["response_cache"].get(key) if key else None
+    flights = current_app.extensions.get("single_flight")
+    if entry is None and key and flights is not None:
+        flight, leader = flights.join(key)
+        if leader:
+            g.flight = (key, flight)
+        else:
+            entry = flights.wait(flight)
+    if entry is None or current_app.config["HISTORY_ON_CACHE_HIT"]:
+        add_to_history(request)
+    return entry
+
+
+def land_flight(_=None, entry=None) -> None:
+    """Ends the flight this request leads, if any, sharing entry with the
+    requests waiting for it. Runs after every request in case it failed."""
+    flight = g.pop("flight", None)
+    if flight is not None:
+        current_app.extensions["single_flight"].land(*flight, entry)
+
+
+def use_date_parser() -> None:
+    """Makes the app's own date parser the one used for this request."""
+    g.date_parser_token = current_parser.set(current_app.extensions["date_parser"])
+
+
+def drop_date_parser(_=None) -> None:
+    """Goes back to the default date parser after a request."""
+    token = g.pop("date_parser_token", None)
+    if token is not None:
+        current_parser.reset(token)
+
+
+def cached_response(entry, max_age: int = CACHE_MAX_AGE) -> Response:
+    """Returns a cached body with its ETag, and for GET requests, which
+    are the only ones shared caches keep or that can be answered with a
+    304, its caching headers."""
+    response = Response(entry.body, mimetype=MSGPACK if request.wants_msgpack
+                        else "application/json")
+    response.vary.add("Accept")
+    response.set_etag(entry.etag)
+    if request.method not in ("GET", "HEAD"):
+        return response
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    return response.make_conditional(request)
+
+
+def cache_response(key: tuple, body: dict, expires: float | None = None) -> Response:
+    """Caches a successful response body and returns it."""
+    encoded = packb(body) if request.wants_msgpack else current_app.json.dumps(body).encode()
+    entry = current_app.extensions["response_cache"].put(key, encoded, expires)
+    land_flight(entry=entry)
+    return cached_response(entry, CACHE_MAX_AGE if expires is None
+                           else max(int(expires - time()), 0))
+
+
+def get_calendar(name) -> HolidayCalendar:
+    """Returns the holiday calendar with a name, or the default calendar."""
+    if name is None:
+        name = current_app.config["HOLIDAY_CALENDAR"]
+    return current_app.extensions["calendars"].get(name)
+
+
+def get_batch_items() -> list:
+    """Returns the items of a batch request as a list.
+
+    The body is either a JSON array or newline-delimited JSON objects."""
+    if request.is_json:
+        data = request.get_json(silent=True)
+        return data if isinstance(data, list) else []
+    items = []
+    for line in request.get_data(as_text=True).splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError:
+            items.append(None)
+    return items
+
+
+def check_batch_size(items: list) -> tuple[dict, int] | None:
+    """Returns an error response if a batch is empty or too large."""
+    if not items or len(items) > MAX_BATCH_SIZE:
+        return {"error": f"Batch must contain between 1 and {MAX_BATCH_SIZE} items."}, 400
+    return None
+
+
+@api_route("/", ["GET"])
 def index():
     """Returns an API welcome messsage."""
-    return jsonify({"message": "Welcome to the Days API."})
+    return json_body(WELCOME)
 
 
-@app.route("/between", methods=["POST"])
+@api_route("/between", ["POST"])
 def between():
     """Returns the number of days between two dates"""
-    add_to_history(request)
+    data = request.get_json(silent=True)
+    invalid = rejected(BETWEEN, data)
+    if invalid is not None:
+        return invalid
+    key = cache_key("between", data, "first", "last")
+    entry = cache_lookup(key)
+    if entry:
+        return cached_response(entry)
 
-    data = request.get_json()
-    if "first" not in data.keys() or "last" not in data.keys():
-        return {"error": "Missing required data."}, 400
     try:
-        first = convert_to_datetime(data["first"])
-        last = convert_to_datetime(data["last"])
-    except ValueError:
-        return {"error": "Unable to convert value to datetime."}, 400
+        zone = get_zone(data.get("tz"))
+        first = in_zone(convert_to_datetime(data["first"]), zone)
+        last = in_zone(convert_to_datetime(data["last"]), zone)
+    except ValueError as error:
+        return json_body(error_body(str(error)), 400)
 
-    return {"days": get_days_between(first, last)}
+    return cache_response(key, {"days": get_days_between(first, last)})
 
 
-@app.route("/weekday", methods=["POST"])
+@api_route("/between/batch", ["POST"])
+def between_batch():
+    """Returns the number of days between each pair of dates in a batch"""
+    add_to_history(request)
+
+    items = get_batch_items()
+    error = check_batch_size(items)
+    if error:
+        return error
+    try:
+        zone = get_zone(request.args.get("tz"))
+    except ValueError as error:
+        return json_body(error_body(str(error)), 400)
+
+    errors = [BETWEEN_ITEM.validate(item) for item in items]
+    firsts = convert_all_to_datetime(
+        [item["first"] for item, error in zip(items, errors) if error is None], zone)
+    lasts = convert_all_to_datetime(
+        [item["last"] for item, error in zip(items, errors) if error is None], zone)
+
+    results = []
+    pairs = zip(firsts, lasts)
+    for error in errors:
+        if error is not None:
+            results.append({"error": error})
+            continue
+        first, last = next(pairs)
+        if first is None or last is None:
+            results.append({"error": "Unable to convert value to datetime."})
+        else:
+            results.append({"days": get_days_between(first, last)})
+    return results, 200
+
+
+@api_route("/weekday", ["POST"])
 def weekday():
     """Returns the day of the week a specific date is"""
+    data = request.get_json(silent=True)
+    invalid = rejected(WEEKDAY, data)
+    if invalid is not None:
+        return invalid
+    key = cache_key("weekday", data, "date")
+    entry = cache_lookup(key)
+    if entry:
+        return cached_response(entry)
+
+    try:
+        zone = get_zone(data.get("tz"))
+        week = in_zone(convert_to_datetime(data["date"]), zone)
+    except ValueError as error:
+        return json_body(error_body(str(error)), 400)
+    return cache_response(key, {"weekday": get_day_of_week_on(week)})
+
+
+@api_route("/weekday/batch", ["POST"])
+def weekday_batch():
+    """Returns the day of the week for each date in a batch"""
     add_to_history(request)
 
-    data = request.get_json()
-    if "date" not in data.keys():
-        return {"error": "Missing required data."}, 400
+    items = get_batch_items()
+    error = check_batch_size(items)
+    if error:
+        return error
     try:
-        week = convert_to_datetime(data["date"])
-    except ValueError:
-        return {"error": "Unable to convert value to datetime."}, 400
-    return {"weekday": get_day_of_week_on(week)}, 200
+        zone = get_zone(request.args.get("tz"))
+    except ValueError as error:
+        return json_body(error_body(str(error)), 400)
+
+    errors = [WEEKDAY_ITEM.validate(item) for item in items]
+    dates = iter(convert_all_to_datetime(
+        [item["date"] for item, error in zip(items, errors) if error is None], zone))
+
+    results = []
+    for error in errors:
+        if error is not None:
+            results.append({"error": error})
+            continue
+        week = next(dates)
+        if week is None:
+            results.append({"error": "Unable to convert value to datetime."})
+        else:
+            results.append({"weekday": get_day_of_week_on(week)})
+    return results, 200
+
+
+@api_route("/business_days", ["POST"])
+def business_days():
+    """Returns the number of working days between two dates"""
+    data = request.get_json(silent=True)
+    invalid = rejected(BUSINESS_DAYS, data)
+    if invalid is not None:
+        return invalid
+    key = cache_key("business_days", data, "first", "last", options=CALENDAR_OPTIONS)
+    entry = cache_lookup(key)
+    if entry:
+        return cached_response(entry)
+
+    try:
+        zone = get_zone(data.get("tz"))
+        calendar = get_calendar(data.get("calendar"))
+        first = in_zone(convert_to_datetime(data["first"]), zone)
+        last = in_zone(convert_to_datetime(data["last"]), zone)
+    except ValueError as error:
+        return json_body(error_body(str(error)), 400)
+
+    return cache_response(key, {"business_days": calendar.count(first, last)})
+
+
+@api_route("/add_business_days", ["POST"])
+def add_business_days():
+    """Returns the date a number of working days after another"""
+    data = request.get_json(silent=True)
+    invalid = rejected(ADD_BUSINESS_DAYS, data)
+    if invalid is not None:
+        return invalid
+    key = cache_key("add_business_days", data, "date", "days", options=CALENDAR_OPTIONS)
+    entry = cache_lookup(key)
+    if entry:
+        return cached_response(entry)
 
+    try:
+        zone = get_zone(data.get("tz"))
+        calendar = get_calendar(data.get("calendar"))
+        start = in_zone(convert_to_datetime(data["date"]), zone)
+        result = calendar.add(start.date(), data["days"])
+    except ValueError as error:
+        return json_body(error_body(str(error)), 400)
+
+    return cache_response(key, {"date": format_date(result)})
+
+
+@api_route("/range", ["POST"])
+def date_range():
+    """Returns counts of days of each kind between two dates"""
+    data = request.get_json(silent=True)
+    invalid = rejected(BETWEEN, data)
+    if invalid is not None:
+        return invalid
+    key = cache_key("range", data, "first", "last")
+    entry = cache_lookup(key)
+    if entry:
+        return cached_response(entry)
 
-@app.route("/history", methods=["GET"])
-def history():
-    """Returns details on the last number of requests to the API"""
+    try:
+        zone = get_zone(data.get("tz"))
+        first = in_zone(convert_to_datetime(data["first"]), zone)
+        last = in_zone(convert_to_datetime(data["last"]), zone)
+        summary = get_range_summary(first, last)
+    except ValueError as error:
+        return json_body(error_body(str(error)), 400)
+
+    return cache_response(key, summary)
+
+
+@api_route("/range/dates", ["POST"])
+def date_range_dates():
+    """Streams each date between two dates, or each on one day of the week"""
     add_to_history(request)
 
-    args = request.args.to_dict()
-    number = args.get("number", "5")
+    data = request.get_json(silent=True)
+    invalid = rejected(BETWEEN, data, record=False)
+    if invalid is not None:
+        return invalid
+    try:
+        zone = get_zone(data.get("tz"))
+        first = in_zone(convert_to_datetime(data["first"]), zone)
+        last = in_zone(convert_to_datetime(data["last"]), zone)
+        dates = iter_dates(first, last, data.get("weekday"))
+    except ValueError as error:
+        return json_body(error_body(str(error)), 400)
+
+    # pylint: disable = import-outside-toplevel
+    from bulk import dates_ndjson
+    return Response(dates_ndjson(dates), mimetype="application/x-ndjson")
+
 
-    if not number.isdigit():
-        return {"error": "Number must be an integer between 1 and 20."}, 400
+@api_route("/bulk", ["POST"])
+def bulk():
+    """Streams the weekday or days between for each row of an upload"""
+    add_to_history(request)
+
+    if request.mimetype not in BULK_FORMATS:
+        return {"error": "Content type must be application/x-ndjson or text/csv."}, 415
+
+    # pylint: disable = import-outside-toplevel
+    from bulk import read_lines, process_csv, process_ndjson
+    process = process_csv if request.mimetype == "text/csv" else process_ndjson
+    rows = process(read_lines(request.stream))
+    return Response(stream_with_context(rows), mimetype=request.mimetype)
 
-    number = int(number)
-    if not 1 <= number <= 20:
-        return {"error": "Number must be an integer between 1 and 20."}, 400
 
-    return app_history[::-1][:number], 200
+@api_route("/history", ["GET"])
+def history():
+    """Returns details on the last number of requests to the API"""
+    add_to_history(request)
 
+    args = request.args
+    invalid = rejected(HISTORY, args, record=False)
+    if invalid is not None:
+        return invalid
 
-@app.route("/history", methods=["DELETE"])
+    store = current_app.extensions["history"]
+    number = int(args.get("number", "5"))
+    if not any(name in args for name in HISTORY_FILTERS):
+        return store.latest(number), 200
+
+    try:
+        since = parse_instant(args["since"]) if "since" in args else None
+        until = parse_instant(args["until"]) if "until" in args else None
+    except ValueError:
+        return json_body(error_body(INVALID_TIME), 400)
+    method = args["method"].upper() if "method" in args else None
+    if "aggregate" in args:
+        return store.aggregate(BUCKETS[args["aggregate"]], route=args.get("route"),
+                               method=method, since=since, until=until), 200
+
+    cursor = int(args["cursor"]) if "cursor" in args else None
+    entries, cursor = store.query(number, route=args.get("route"), method=method,
+                                  since=since, until=until, before=cursor)
+    if cursor is None:
+        return entries, 200
+    next_page = url_for("history", **{**args.to_dict(), "cursor": cursor})
+    return entries, 200, {"Link": f'<{next_page}>; rel="next"'}
+
+
+@api_route("/history", ["DELETE"])
 def delete_history():
     """Deletes details of all previous requests to the API"""
-    app_history.clear()
+    current_app.extensions["history"].clear()
     return {"status": "History cleared"}, 200
 
 
-@app.route("/current_age", methods=["GET"])
+@api_route("/metrics", ["GET"])
+def metrics():
+    """Returns request counts and latencies in the Prometheus text format"""
+    cache = current_app.extensions["date_parser"].cache.info()
+    flights = current_app.extensions.get("single_flight")
+    return Response(current_app.extensions["metrics"].render({
+        "days_api_parse_cache_hits_total": cache["hits"],
+        "days_api_parse_cache_misses_total": cache["misses"],
+        "days_api_parse_cache_evictions_total": cache["evictions"],
+        "days_api_single_flight_leaders_total": 0 if flights is None else flights.leaders,
+        "days_api_coalesced_requests_total": 0 if flights is None else flights.coalesced
+    }), content_type=CONTENT_TYPE)
+
+
+@api_route("/current_age", ["GET"])
 def current_age():
     """Returns a current age in years based on a given birthdate."""
-    add_to_history(request)
-
     args = request.args.to_dict()
-    birthdate = args.get("date")
-
-    if not birthdate and not isinstance(birthdate, date):
-        return {"error": "Date parameter is required."}, 400
+    invalid = rejected(CURRENT_AGE, args)
+    if invalid is not None:
+        return invalid
+    key = cache_key("current_age", args, "date")
+    entry = cache_lookup(key)
+    if entry:
+        return cached_response(entry, max(int(entry.expires - time()), 0))
 
     try:
-        return {"current_age": get_current_age(birthdate)}
-    except TypeError:
+        zone = get_zone(args.get("tz"))
+    except ValueError as error:
+        return json_body(error_body(str(error)), 400)
+    try:
+        birthdate = convert_to_date(args["date"], zone)
+    except ValueError:
         return {"error": "Value for data parameter is invalid."}, 400
 
+    # Ages change at midnight, so cached answers expire then
+    return cache_response(key, {"current_age": get_current_age(birthdate, zone)},
+                          next_midnight(zone))
+
 
 if __name__ == "__main__":
-    app.run(port=8080, debug=True)
+    create_app().run(port=8080, debug=True)
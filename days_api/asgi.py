@@ -0,0 +1,201 @@
+"""This file exposes the API as an ASGI application.
+
+Run it with an ASGI server, for example `uvicorn asgi:application`."""
+
+import asyncio
+import queue
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from os import environ
+
+from app import app  # pylint: disable = no-name-in-module
+
+MAX_WORKERS = int(environ.get("ASGI_WORKERS", 32))
+# Chunks held in each direction before the side sending them waits
+QUEUED_CHUNKS = 8
+
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="asgi")
+
+
+class BodyStream:
+    """A blocking file-like view of the chunks of an ASGI request body.
+
+    At most limit chunks are held at once; put waits on the event loop,
+    without blocking it, until the worker thread has read one."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, limit: int = QUEUED_CHUNKS):
+        self.chunks = queue.Queue(limit + 1)
+        self._loop = loop
+        self._space = asyncio.Semaphore(limit)
+        self._buffer = b""
+        self._finished = False
+
+    async def put(self, chunk: bytes) -> None:
+        """Adds a chunk, waiting until there is room for it."""
+        await self._space.acquire()
+        self.chunks.put_nowait(chunk)
+
+    def finish(self) -> None:
+        """Marks the end of the body."""
+        self.chunks.put_nowait(None)
+
+    def _fill(self) -> bool:
+        if self._finished:
+            return False
+        chunk = self.chunks.get()
+        if chunk is None:
+            self._finished = True
+            return False
+        self._loop.call_soon_threadsafe(self._space.release)
+        self._buffer += chunk
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        """Reads up to size bytes, or everything if size is negative."""
+        while (size < 0 or len(self._buffer) < size) and self._fill():
+            pass
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def readline(self, size: int = -1) -> bytes:
+        """Reads up to and including the next newline."""
+        while b"\n" not in self._buffer and (size < 0 or len(self._buffer) < size) \
+                and self._fill():
+            pass
+        end = self._buffer.find(b"\n") + 1 or len(self._buffer)
+        if 0 <= size < end:
+            end = size
+        data, self._buffer = self._buffer[:end], self._buffer[end:]
+        return data
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+
+def build_environ(scope: dict, body: BodyStream) -> dict:
+    """Returns the WSGI environ for an ASGI HTTP scope."""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ_ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        # ASGI paths are already decoded, where WSGI expects latin-1 bytes
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.input_terminated": True,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = f"HTTP_{name}"
+        environ_[name] = f"{environ_[name]},{value}" if name in environ_ else value
+    return environ_
+
+
+def run_wsgi(environ_: dict, loop: asyncio.AbstractEventLoop,
+             messages: asyncio.Queue) -> None:
+    """Runs the Flask app in a worker thread, passing the response start
+    and each body chunk back to the event loop as they are produced, and
+    waiting while the queue of chunks not yet sent is full."""
+
+    def put(message) -> None:
+        asyncio.run_coroutine_threadsafe(messages.put(message), loop).result()
+
+    def start_response(status, headers, exc_info=None):  # pylint: disable = unused-argument
+        put({
+            "type": "http.response.start",
+            "status": int(status.split(" ", 1)[0]),
+            "headers": [(k.lower().encode("latin-1"), v.encode("latin-1"))
+                        for k, v in headers]
+        })
+
+    try:
+        result = app.wsgi_app(environ_, start_response)
+        try:
+            for chunk in result:
+                if chunk:
+                    put(chunk)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+    finally:
+        put(None)
+
+
+async def pump_body(receive, body: BodyStream) -> None:
+    """Feeds request body chunks from the server to the worker thread."""
+    try:
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            await body.put(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+    finally:
+        body.finish()
+
+
+async def lifespan(receive, send) -> None:
+    """Acknowledges server startup and shutdown."""
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope: dict, receive, send) -> None:
+    """The ASGI entry point for the API."""
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        raise ValueError(f"Unsupported scope type: {scope['type']}")
+
+    loop = asyncio.get_running_loop()
+    body = BodyStream(loop)
+    messages = asyncio.Queue(QUEUED_CHUNKS)
+    pump = asyncio.create_task(pump_body(receive, body))
+    worker = loop.run_in_executor(executor, run_wsgi,
+                                  build_environ(scope, body), loop, messages)
+
+    message = {}
+    try:
+        while (message := await messages.get()) is not None:
+            if isinstance(message, dict):
+                await send(message)
+            else:
+                await send({"type": "http.response.body", "body": message,
+                            "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+    finally:
+        pump.cancel()
+        # If sending failed, keep taking chunks so the worker can finish
+        while message is not None:
+            message = await messages.get()
+        await worker
+
+
+if __name__ == "__main__":
+    try:
+        import uvicorn  # pylint: disable = import-outside-toplevel
+    except ImportError:
+        sys.exit("Serving over ASGI requires an ASGI server: pip3 install uvicorn")
+    uvicorn.run("asgi:application", port=8080)
@@ -0,0 +1,348 @@
+"""This file benchmarks the date functions and the API routes.
+
+    python3 benchmark.py micro                      # date functions
+    python3 benchmark.py routes                     # routes, in-process
+    python3 benchmark.py load --url http://localhost:8080
+    python3 benchmark.py json                       # JSON providers, per route
+    python3 benchmark.py startup                    # cold start, in new processes
+    python3 benchmark.py wire                       # JSON and MessagePack batch payloads
+    python3 benchmark.py compare old.json new.json
+
+Results are written as JSON (to stdout, or to --output) so that runs
+from different commits, or with different settings such as
+JSON_PROVIDER=stdlib or METRICS_ENABLED=0, can be compared."""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import timeit
+from datetime import date, datetime
+from functools import partial
+from urllib.parse import urlsplit
+
+from date_functions import (convert_to_datetime, parse_date, get_days_between,
+                            get_day_of_week_on, get_current_age)
+from validation import BETWEEN
+
+FIRST = datetime(2000, 1, 12)
+LAST = datetime(2023, 10, 9)
+
+MICRO_CASES = {
+    "convert_to_datetime": lambda: convert_to_datetime("09.10.2023"),
+    "parse_date": lambda: parse_date("09.10.2023"),
+    "parse_date.iso": lambda: parse_date("2023-10-09T12:00:00+01:00"),
+    "parse_date.rfc2822": lambda: parse_date("Mon, 09 Oct 2023 12:00:00 +0000"),
+    "get_days_between": lambda: get_days_between(FIRST, LAST),
+    "get_day_of_week_on": lambda: get_day_of_week_on(LAST),
+    "get_current_age": lambda: get_current_age(date(2000, 1, 12)),
+    "validate.between": lambda: BETWEEN.validate({"first": "12.1.2000", "last": "09.10.2023"}),
+}
+
+ROUTE_CASES = {
+    "index": ("GET", "/", None),
+    "between": ("POST", "/between", {"first": "12.1.2000", "last": "09.10.2023"}),
+    "weekday": ("POST", "/weekday", {"date": "09.10.2023"}),
+    "business_days": ("POST", "/business_days", {"first": "12.1.2000", "last": "09.10.2023"}),
+    "history": ("GET", "/history?number=20", None),
+    "history.filtered": ("GET", "/history?route=weekday&method=POST&number=20", None),
+    "history.aggregate": ("GET", "/history?aggregate=minute", None),
+    "current_age": ("GET", "/current_age?date=2000-01-12", None),
+    # Invalid traffic, which is turned away before any parsing
+    "between.missing": ("POST", "/between", {"first": "12.1.2000"}),
+    "between.nested": ("POST", "/between", {"first": [[0] * 100] * 100, "last": "09.10.2023"}),
+}
+
+
+RESPONSE_BODIES = {
+    "index": {"message": "Welcome to the Days API."},
+    "between": {"days": 8671},
+    "weekday": {"weekday": "Monday"},
+    "business_days": {"business_days": 6163},
+    "history": [{"method": "GET", "at": "09/10/2023 18:36", "route": "history"}] * 20,
+    "history.filtered": [{"method": "POST", "at": "09/10/2023 18:36", "route": "weekday"}] * 20,
+    "history.aggregate": [{"at": "09/10/2023 18:36", "method": "POST", "route": "weekday",
+                           "count": 12}] * 10,
+    "current_age": {"current_age": 23},
+    "between.missing": {"error": "Missing required data."},
+    "between.nested": {"error": "Unable to convert value to datetime."},
+}
+
+# Batch request and response bodies, as sent over the wire
+WIRE_CASES = {
+    "between.batch": ([{"first": "12.1.2000", "last": "09.10.2023"}] * 100,
+                      [{"days": 8671}] * 100),
+    "weekday.batch": ([{"date": "09.10.2023"}] * 100, [{"weekday": "Monday"}] * 100),
+    "history": (None, RESPONSE_BODIES["history"]),
+}
+
+
+# Run in a new interpreter to time each stage of a cold start
+STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+created = time.perf_counter()
+application.test_client().get("/")
+answered = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1e3,
+                  "create_ms": (created - imported) * 1e3,
+                  "first_response_ms": (answered - created) * 1e3,
+                  "total_ms": (answered - start) * 1e3}))
+"""
+
+
+def summarise(latencies: list[float], elapsed: float) -> dict:
+    """Returns latency percentiles (in microseconds) and throughput."""
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 \
+        else latencies * 99
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_us": round(statistics.fmean(latencies) * 1e6, 2),
+        "p50_us": round(cuts[49] * 1e6, 2),
+        "p95_us": round(cuts[94] * 1e6, 2),
+        "p99_us": round(cuts[98] * 1e6, 2),
+    }
+
+
+def time_call(func, repeat: int) -> dict:
+    """Times a function, reporting nanoseconds per call."""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    times = [t / number * 1e9 for t in timer.repeat(repeat, number)]
+    return {"calls": number, "best_ns": round(min(times), 1),
+            "median_ns": round(statistics.median(times), 1)}
+
+
+def run_micro(repeat: int) -> dict:
+    """Times each date function."""
+    return {name: time_call(func, repeat) for name, func in MICRO_CASES.items()}
+
+
+def run_routes(requests: int, client=None) -> dict:
+    """Sends requests to each route through the Flask test client."""
+    if client is None:
+        from app import app  # pylint: disable = import-outside-toplevel, no-name-in-module
+        client = app.test_client()
+    results = {}
+    for name, (method, path, body) in ROUTE_CASES.items():
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(requests):
+            sent = time.perf_counter()
+            client.open(path, method=method, json=body)
+            latencies.append(time.perf_counter() - sent)
+        results[name] = summarise(latencies, time.perf_counter() - start)
+    return results
+
+
+def run_json(repeat: int) -> dict:
+    """Times parsing each route's request body and building its response
+    with the standard library and the fast JSON providers."""
+    from flask import Flask  # pylint: disable = import-outside-toplevel
+    from flask.json.provider import DefaultJSONProvider  # pylint: disable = import-outside-toplevel
+    from json_provider import FastJSONProvider, orjson  # pylint: disable = import-outside-toplevel
+
+    app = Flask(__name__)
+    providers = {"stdlib": DefaultJSONProvider(app)}
+    if orjson is not None:
+        providers["fast"] = FastJSONProvider(app)
+
+    def request_cycle(provider, raw: bytes | None, response) -> None:
+        if raw is not None:
+            provider.loads(raw)
+        provider.response(response)
+
+    results = {}
+    with app.app_context():
+        for name, (_, _, body) in ROUTE_CASES.items():
+            raw = json.dumps(body).encode() if body is not None else None
+            for provider_name, provider in providers.items():
+                results[f"{name}.{provider_name}"] = time_call(
+                    partial(request_cycle, provider, raw, RESPONSE_BODIES[name]), repeat)
+    return results
+
+
+def run_wire(repeat: int) -> dict:
+    """Times encoding each batch body and decoding it again with each JSON
+    and MessagePack codec available, with the size of its encoding."""
+    import msgpack_format  # pylint: disable = import-outside-toplevel
+    from json_provider import orjson  # pylint: disable = import-outside-toplevel
+
+    codecs = {"json": (lambda obj: json.dumps(obj, separators=(",", ":")).encode(), json.loads),
+              "msgpack": (msgpack_format.packb, msgpack_format.unpackb)}
+    if orjson is not None:
+        codecs["orjson"] = (orjson.dumps, orjson.loads)  # pylint: disable = no-member
+
+    results = {}
+    for name, bodies in WIRE_CASES.items():
+        for kind, body in zip(("request", "response"), bodies):
+            if body is None:
+                continue
+            for codec_name, (dumps, loads) in codecs.items():
+                encoded = dumps(body)
+                results[f"{name}.{kind}.{codec_name}"] = {
+                    "bytes": len(encoded),
+                    "encode": time_call(partial(dumps, body), repeat),
+                    "decode": time_call(partial(loads, encoded), repeat)}
+    return results
+
+
+def run_startup(runs: int) -> dict:
+    """Times importing the app, creating it and answering its first request,
+    each in a new process, along with the whole process's run time."""
+    stages = {}
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT],
+                                capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        timings = json.loads(output)
+        timings["process_ms"] = (time.perf_counter() - started) * 1e3
+        for stage, value in timings.items():
+            stages.setdefault(stage, []).append(value)
+    return {stage: {"best_ms": round(min(values), 2),
+                    "median_ms": round(statistics.median(values), 2)}
+            for stage, values in stages.items()}
+
+
+def load_worker(url: str, case: tuple, deadline: float,
+                latencies: list[float]) -> None:
+    """Sends requests for one route case one after another until the deadline."""
+    method, path, body = case
+    parts = urlsplit(url)
+    payload = json.dumps(body).encode() if body is not None else None
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80)
+    while time.perf_counter() < deadline:
+        sent = time.perf_counter()
+        try:
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.will_close:
+                connection.close()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            continue
+        latencies.append(time.perf_counter() - sent)
+    connection.close()
+
+
+def run_load(url: str, concurrency: int, duration: float) -> dict:
+    """Runs a closed-loop HTTP load test of each route against a server."""
+    results = {}
+    for name, case in ROUTE_CASES.items():
+        latencies = []
+        start = time.perf_counter()
+        deadline = start + duration
+        threads = [threading.Thread(target=load_worker,
+                                    args=(url, case, deadline, latencies))
+                   for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if latencies:
+            results[name] = summarise(latencies, time.perf_counter() - start)
+    return results
+
+
+def compare(old: dict, new: dict) -> dict:
+    """Returns the ratio of new to old for each shared measurement."""
+    ratios = {}
+    for name, before in old.get("results", {}).items():
+        after = new.get("results", {}).get(name)
+        if not after:
+            continue
+        ratios[name] = {key: round(after[key] / before[key], 3)
+                        for key in before
+                        if key.endswith(("_ns", "_us", "rps")) and before[key]}
+    return ratios
+
+
+def metadata() -> dict:
+    """Returns details of the environment the benchmark ran in."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(),
+            "machine": platform.machine(), "at": datetime.now().isoformat()}
+
+
+def parse_args(args: list[str] | None = None) -> argparse.Namespace:
+    """Returns the command-line options."""
+    parser = argparse.ArgumentParser(description="Benchmark the Days API.")
+    parser.add_argument("--output", help="file to write the JSON results to")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    micro = commands.add_parser("micro", help="time the date functions")
+    micro.add_argument("--repeat", type=int, default=5)
+
+    routes = commands.add_parser("routes", help="time each route in-process")
+    routes.add_argument("--requests", type=int, default=2000)
+
+    provider = commands.add_parser("json", help="time the JSON providers per route")
+    provider.add_argument("--repeat", type=int, default=5)
+
+    startup = commands.add_parser("startup", help="time cold starts in new processes")
+    startup.add_argument("--runs", type=int, default=10)
+
+    wire = commands.add_parser("wire", help="time JSON and MessagePack batch payloads")
+    wire.add_argument("--repeat", type=int, default=5)
+
+    load = commands.add_parser("load", help="load test a running server")
+    load.add_argument("--url", default="http://localhost:8080")
+    load.add_argument("--concurrency", type=int, default=8)
+    load.add_argument("--duration", type=float, default=5.0,
+                      help="seconds to spend on each route")
+
+    diff = commands.add_parser("compare", help="compare two result files")
+    diff.add_argument("old")
+    diff.add_argument("new")
+    return parser.parse_args(args)
+
+
+def main(args: list[str] | None = None) -> None:
+    """Runs the chosen benchmark and writes its results."""
+    options = parse_args(args)
+    if options.command == "compare":
+        with open(options.old, encoding="utf-8") as old, \
+                open(options.new, encoding="utf-8") as new:
+            output = {"ratios": compare(json.load(old), json.load(new))}
+    else:
+        if options.command == "micro":
+            results = run_micro(options.repeat)
+        elif options.command == "routes":
+            results = run_routes(options.requests)
+        elif options.command == "json":
+            results = run_json(options.repeat)
+        elif options.command == "startup":
+            results = run_startup(options.runs)
+        elif options.command == "wire":
+            results = run_wire(options.repeat)
+        else:
+            results = run_load(options.url, options.concurrency, options.duration)
+        output = {"benchmark": options.command, "meta": metadata(), "results": results}
+
+    text = json.dumps(output, indent=2)
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""This file processes streams of dates one row at a time.
+
+Rows are read, computed and written by a pipeline of generators, so
+memory use does not grow with the size of the upload."""
+
+import csv
+import io
+import json
+from datetime import date
+from typing import Iterable, Iterator, IO
+
+from date_functions import (convert_to_datetime, get_days_between, get_day_of_week_on,
+                            in_zone, format_date, WEEKDAY_NAMES)
+
+MAX_LINE_LENGTH = 64 * 1024
+LINE_TOO_LONG = "Line too long."
+# Dates written per chunk of a streamed range
+DATES_PER_CHUNK = 512
+
+
+def read_lines(stream: IO[bytes]) -> Iterator[str | None]:
+    """Yields the decoded lines of a binary stream, and None in place of
+    each line of MAX_LINE_LENGTH bytes or more, which is skipped."""
+    for line in iter(lambda: stream.readline(MAX_LINE_LENGTH), b""):
+        if len(line) == MAX_LINE_LENGTH and not line.endswith(b"\n"):
+            while line and not line.endswith(b"\n"):
+                line = stream.readline(MAX_LINE_LENGTH)
+            yield None
+            continue
+        yield line.decode("utf-8", errors="replace").rstrip("\r\n")
+
+
+def process_row(first: str | None, last: str | None, single: str | None) -> dict:
+    """Returns the result for one row: the days between first and last, or
+    the weekday of single."""
+    try:
+        if first is not None and last is not None:
+            return {"days": get_days_between(in_zone(convert_to_datetime(first)),
+                                             in_zone(convert_to_datetime(last)))}
+        if single is not None:
+            return {"weekday": get_day_of_week_on(in_zone(convert_to_datetime(single)))}
+    except ValueError:
+        return {"error": "Unable to convert value to datetime."}
+    return {"error": "Missing required data."}
+
+
+def process_json_line(line: str) -> dict:
+    """Returns the result for one line of JSON."""
+    try:
+        row = json.loads(line)
+    except ValueError:
+        return {"error": "Invalid JSON."}
+    if isinstance(row, dict):
+        return process_row(row.get("first"), row.get("last"), row.get("date"))
+    return {"error": "Missing required data."}
+
+
+def process_ndjson(lines: Iterator[str | None]) -> Iterator[str]:
+    """Yields one JSON result line per non-blank input line."""
+    for number, line in enumerate(lines, 1):
+        if line is None:
+            result = {"error": LINE_TOO_LONG}
+        elif not line.strip():
+            continue
+        else:
+            result = process_json_line(line)
+        if "error" in result:
+            result["line"] = number
+        yield json.dumps(result) + "\n"
+
+
+def process_csv(lines: Iterator[str | None]) -> Iterator[str]:
+    """Yields one CSV result row per input row.
+
+    A row with one column is a date and gets its weekday; a row with two
+    is a first and last date and gets the days between them. Each output
+    row is the input columns followed by the result and any error. A
+    header row of "date" or "first,last" is passed through. Lines too long
+    to read get an error row with no columns."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    skipped = []
+
+    def blank_skipped(source: Iterator[str | None]) -> Iterator[str]:
+        # Skipped lines are read as blank rows, and noted to tell them apart
+        for line in source:
+            if line is None:
+                skipped.append(line)
+                line = ""
+            yield line
+
+    for number, row in enumerate(csv.reader(blank_skipped(lines)), 1):
+        if not row and skipped:
+            skipped.pop()
+            writer.writerow(["", LINE_TOO_LONG])
+        elif not row:
+            continue
+        elif number == 1 and row in (["date"], ["first", "last"]):
+            writer.writerow([*row, "result", "error"])
+        else:
+            if len(row) == 1:
+                result = process_row(None, None, row[0])
+            elif len(row) == 2:
+                result = process_row(row[0], row[1], None)
+            else:
+                result = {"error": "Missing required data."}
+            value = result.get("days", result.get("weekday", ""))
+            writer.writerow([*row, value, result.get("error", "")])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def dates_ndjson(dates: Iterable[date]) -> Iterator[str]:
+    """Yields a JSON line with the weekday of each date, in chunks of lines."""
+    lines = []
+    for day in dates:
+        # Dates and weekday names need no escaping, so skip the encoder
+        name = WEEKDAY_NAMES[day.weekday()]
+        lines.append(f'{{"date":"{format_date(day)}","weekday":"{name}"}}\n')
+        if len(lines) == DATES_PER_CHUNK:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
@@ -0,0 +1,121 @@
+"""This file counts working days: Mondays to Fridays that are not holidays.
+
+Holiday calendars are read from text files of ISO 8601 dates, one per
+line, and kept as sorted arrays of day numbers, so that counting the
+working days between any two dates, or the date a number of working
+days away, takes a closed-form count of weekdays and a few binary
+searches."""
+
+import re
+from array import array
+from bisect import bisect_left
+from datetime import date
+from os import path
+from threading import Lock
+
+HOLIDAY_DIR = path.join(path.dirname(path.abspath(__file__)), "holidays")
+DEFAULT_CALENDAR = "england-and-wales"
+# A calendar of no holidays, counting weekends only
+NO_CALENDAR = "none"
+CALENDAR_NAME = re.compile(r"[a-z0-9-]+")
+MAX_ORDINAL = date.max.toordinal()
+
+
+def weekdays_before(ordinal: int) -> int:
+    """Returns the number of Mondays to Fridays before a day number,
+    counting from 1 January of year 1, a Monday."""
+    weeks, days = divmod(ordinal - 1, 7)
+    return weeks * 5 + min(days, 5)
+
+
+class HolidayCalendar:
+    """The holidays falling on weekdays in one calendar."""
+
+    def __init__(self, holidays=()):
+        self.holidays = array("l", sorted({day.toordinal() for day in holidays
+                                           if day.weekday() < 5}))
+
+    def working_days_before(self, ordinal: int) -> int:
+        """Returns the number of working days before a day number."""
+        return weekdays_before(ordinal) - bisect_left(self.holidays, ordinal)
+
+    def is_working_day(self, day: date) -> bool:
+        """Returns whether a date is a working day."""
+        ordinal = day.toordinal()
+        return (day.weekday() < 5
+                and self.working_days_before(ordinal + 1) > self.working_days_before(ordinal))
+
+    def count(self, first: date, last: date) -> int:
+        """Returns the number of working days from first up to but not
+        including last, negative if last is before first."""
+        return (self.working_days_before(last.toordinal())
+                - self.working_days_before(first.toordinal()))
+
+    def first_day_after(self, count: int) -> int:
+        """Returns the first day number with count working days before it.
+
+        This starts from the first day with count weekdays before it and
+        moves later by the holidays before the day reached so far, until
+        there are no more."""
+        holidays = 0
+        while True:
+            weeks, days = divmod(count + holidays, 5)
+            # With a whole number of weeks, the Saturday after the last Friday
+            ordinal = weeks * 7 + days + 1 if days else weeks * 7 - 1
+            before = bisect_left(self.holidays, ordinal)
+            if before == holidays:
+                return ordinal
+            holidays = before
+
+    def add(self, start: date, days: int) -> date:
+        """Returns the date that many working days after start, or before it
+        if days is negative. With no days, returns start if it is a working
+        day, or else the next working day."""
+        ordinal = start.toordinal()
+        if days > 0:
+            result = self.first_day_after(self.working_days_before(ordinal + 1) + days) - 1
+        elif days == 0:
+            result = self.first_day_after(self.working_days_before(ordinal) + 1) - 1
+        else:
+            result = self.first_day_after(self.working_days_before(ordinal) + days + 1) - 1
+        if not 1 <= result <= MAX_ORDINAL:
+            raise ValueError("Date is out of range.")
+        return date.fromordinal(result)
+
+
+def load_calendar(file_path: str) -> HolidayCalendar:
+    """Returns the calendar of holidays listed in a file."""
+    holidays = []
+    with open(file_path, encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                holidays.append(date.fromisoformat(line[:10]))
+    return HolidayCalendar(holidays)
+
+
+class Calendars:  # pylint: disable = too-few-public-methods
+    """The holiday calendars in a directory, each loaded on first use."""
+
+    def __init__(self, directory: str = HOLIDAY_DIR):
+        self.directory = directory
+        self._calendars = {NO_CALENDAR: HolidayCalendar()}
+        self._lock = Lock()
+
+    def get(self, name: str) -> HolidayCalendar:
+        """Returns the calendar with a name, such as england-and-wales."""
+        if not isinstance(name, str):
+            raise ValueError("Unknown holiday calendar.")
+        calendar = self._calendars.get(name)
+        if calendar is not None:
+            return calendar
+        if not CALENDAR_NAME.fullmatch(name):
+            raise ValueError("Unknown holiday calendar.")
+        with self._lock:
+            if name not in self._calendars:
+                try:
+                    self._calendars[name] = load_calendar(
+                        path.join(self.directory, f"{name}.txt"))
+                except OSError as error:
+                    raise ValueError("Unknown holiday calendar.") from error
+        return self._calendars[name]
@@ -2,20 +2,86 @@
 
 # pylint: skip-file
 
+import asyncio
+
 import pytest
+from flask import Response
+from werkzeug.test import EnvironBuilder
+
+from app import app, app_history, response_cache
+from asgi import application
+
+
+class AsgiTestClient:
+    """A test client that sends requests through the ASGI entry point,
+    with the same interface as the Flask test client."""
+
+    def open(self, path, method="GET", **kwargs):
+        builder = EnvironBuilder(path=path, method=method, **kwargs)
+        environ = builder.get_environ()
+        body = environ["wsgi.input"].read()
+        headers = [(k.lower().encode("latin-1"), v.encode("latin-1"))
+                   for k, v in builder.headers.items()]
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": environ["PATH_INFO"].encode("latin-1").decode("utf-8"),
+            "raw_path": builder.path.encode("latin-1"),
+            "query_string": environ["QUERY_STRING"].encode("latin-1"),
+            "root_path": "",
+            "headers": headers,
+            "client": ("127.0.0.1", 12345),
+            "server": ("localhost", 80),
+        }
+        return asyncio.run(self._send(scope, body))
+
+    async def _send(self, scope, body):
+        requests = [{"type": "http.request", "body": body, "more_body": False}]
+        response = {"body": b""}
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = [(k.decode(), v.decode())
+                                       for k, v in message["headers"]]
+            else:
+                response["body"] += message.get("body", b"")
+
+        await application(scope, receive, send)
+        return Response(response["body"], status=response["status"],
+                        headers=response["headers"])
+
+    def get(self, path, **kwargs):
+        return self.open(path, "GET", **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.open(path, "POST", **kwargs)
 
-from app import app, app_history
+    def delete(self, path, **kwargs):
+        return self.open(path, "DELETE", **kwargs)
 
 
-@pytest.fixture
-def test_app():
-    """Returns a test version of the API."""
+@pytest.fixture(params=("wsgi", "asgi"))
+def test_app(request):
+    """Returns a test version of the API, served through WSGI or ASGI."""
+    if request.param == "asgi":
+        return AsgiTestClient()
     return app.test_client()
 
 
 @pytest.fixture(autouse=True)
 def run_around_tests():
-    """Resets history in between tests."""
+    """Resets history and cached responses in between tests."""
     app_history.clear()
+    response_cache.clear()
     yield
     app_history.clear()
+    response_cache.clear()
@@ -1,14 +1,239 @@
 """Functions for working with dates."""
 
-from datetime import datetime, date
+import re
+from calendar import isleap, leapdays
+from collections import OrderedDict
+from contextvars import ContextVar
+from datetime import datetime, date, time as day_start, timedelta, timezone, tzinfo
+from email.utils import parsedate_to_datetime
+from threading import Lock
+from time import time
+from typing import Iterator
+from zoneinfo import ZoneInfo
+
+PARSE_CACHE_SIZE = 1024
+AGE_CACHE_SIZE = 4096
+DATE_PATTERN = re.compile(r"([0-9]{1,2})\.([0-9]{1,2})\.([0-9]{4})")
+# Formats to try, in the order first tried; epoch times are opt-in
+DEFAULT_FORMATS = ("dmy", "iso", "rfc2822")
+REORDER_EVERY = 1024
+EPOCH_SECONDS = re.compile(r"-?[0-9]+")
+WEEKDAY_NAMES = ("Monday", "Tuesday", "Wednesday", "Thursday",
+                 "Friday", "Saturday", "Sunday")
+
+
+class ParseCache:
+    """A bounded least-recently-used cache of parsed dates, shared by the
+    request threads."""
+
+    def __init__(self, maxsize: int = PARSE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: str) -> datetime | None:
+        """Returns the cached value for key, or None."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: datetime) -> None:
+        """Caches a value, evicting the least recently used if full."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Removes all entries and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self) -> dict:
+        """Returns the cache counters."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "size": len(self._entries),
+                    "maxsize": self.maxsize}
+
+
+def parse_dmy(date_str: str) -> datetime:
+    """Parse a DD.MM.YYYY string without strptime where possible"""
+    match = DATE_PATTERN.fullmatch(date_str)
+    if match:
+        day, month, year = match.groups()
+        return datetime(int(year), int(month), int(day))
+    return datetime.strptime(date_str, "%d.%m.%Y")
+
+
+def parse_iso(date_str: str) -> datetime:
+    """Parse an ISO 8601 string, dropping the time if it has no time zone"""
+    value = datetime.fromisoformat(date_str)
+    if value.tzinfo is None:
+        return datetime(value.year, value.month, value.day)
+    return value
+
+
+def parse_rfc2822(date_str: str) -> datetime:
+    """Parse an RFC 2822 string, dropping the time if it has no time zone"""
+    value = parsedate_to_datetime(date_str)
+    if value.tzinfo is None:
+        return datetime(value.year, value.month, value.day)
+    return value
+
+
+def parse_epoch(date_str: str) -> datetime:
+    """Parse a number of seconds since 1970 as a UTC datetime"""
+    try:
+        return datetime.fromtimestamp(float(date_str), timezone.utc)
+    except (OverflowError, OSError) as error:
+        raise ValueError(f"Timestamp out of range: {date_str}") from error
+
+
+# Each format's matcher recognises the start of strings in that format and
+# no other, so that the order formats are tried in never changes a result
+DATE_FORMATS = {
+    "dmy": (re.compile(r"\s*[0-9]{1,2}\.[0-9]{1,2}\.").match, parse_dmy),
+    "iso": (re.compile(r"[0-9]{4}-").match, parse_iso),
+    "rfc2822": (re.compile(r"\s*(?:[A-Za-z]{3},\s*)?[0-9]{1,2}\s+[A-Za-z]{3}\s").match,
+                parse_rfc2822),
+    "epoch": (re.compile(r"-?[0-9]+(?:\.[0-9]+)?$").match, parse_epoch),
+}
+
+
+class DateParser:
+    """Parses dates in any of a set of formats.
+
+    Formats are tried in order of how often they have matched, which is
+    updated every REORDER_EVERY dates. Dates without a time zone are
+    returned as midnight at the start of their day. convert_to_datetime
+    keeps the dates a parser has parsed in its cache."""
+
+    def __init__(self, formats: tuple[str, ...] = DEFAULT_FORMATS):
+        self.cache = ParseCache()
+        self.counts = {}
+        self._formats = []
+        self._parsed = 0
+        self.set_formats(formats)
+
+    def set_formats(self, formats: tuple[str, ...]) -> None:
+        """Sets the formats to recognise, by name, forgetting dates already parsed."""
+        unknown = set(formats) - DATE_FORMATS.keys()
+        if unknown or not formats:
+            raise ValueError(f"Unknown date formats: {', '.join(sorted(unknown))}")
+        self.counts = dict.fromkeys(formats, 0)
+        self._formats = [(name, *DATE_FORMATS[name]) for name in formats]
+        self.cache.clear()
+
+    def formats(self) -> list[str]:
+        """Returns the names of the formats, in the order they are tried."""
+        return [name for name, _, _ in self._formats]
+
+    def parse(self, date_str: str) -> datetime:
+        """Returns the datetime for a string in one of the formats."""
+        for name, match, parse in self._formats:
+            if match(date_str):
+                value = parse(date_str)
+                break
+        else:
+            raise ValueError(f"Unrecognised date: {date_str}")
+        self.counts[name] += 1
+        self._parsed += 1
+        if self._parsed >= REORDER_EVERY:
+            self._reorder()
+        return value
+
+    def _reorder(self) -> None:
+        counts = self.counts
+        self._formats = sorted(self._formats, key=lambda fmt: counts[fmt[0]], reverse=True)
+        # Halve the counts so the order follows changes in traffic
+        self.counts = {name: count // 2 for name, count in counts.items()}
+        self._parsed = 0
+
+
+date_parser = DateParser()
+parse_cache = date_parser.cache
+# The parser convert_to_datetime uses; apps with formats of their own
+# make theirs current for the length of each request
+current_parser = ContextVar("current_parser", default=date_parser)
+
+
+def parse_date(date_str: str) -> datetime:
+    """Parse a string in any of the recognised formats"""
+    return date_parser.parse(date_str)
+
+
+def set_date_formats(formats: tuple[str, ...]) -> None:
+    """Sets the date formats the default parser recognises, forgetting
+    dates already parsed"""
+    date_parser.set_formats(formats)
+
+
+def get_zone(name) -> tzinfo | None:
+    """Find the time zone with an IANA name such as Europe/London"""
+    if name is None:
+        return None
+    try:
+        return ZoneInfo(name)
+    except (KeyError, ValueError, TypeError) as error:
+        raise ValueError("Unknown time zone.") from error
+
+
+def in_zone(value: datetime, zone: tzinfo | None = None) -> datetime:
+    """Find midnight at the start of a datetime's day in a time zone.
+    Datetimes without a time zone are already local; others default to UTC.
+    Dates from convert_to_datetime must pass through here before use."""
+    if value.tzinfo is None:
+        return value
+    value = value.astimezone(zone or timezone.utc)
+    return datetime(value.year, value.month, value.day)
 
 
 def convert_to_datetime(date_val: str) -> datetime:
     """Change from sting to datetime"""
+    parser = current_parser.get()
+    key = str(date_val)
+    result = parser.cache.get(key)
+    if result is not None:
+        return result
     try:
-        return datetime.strptime(str(date_val), "%d.%m.%Y")
+        result = parser.parse(key)
     except ValueError as error:
         raise ValueError("Unable to convert value to datetime.") from error
+    parser.cache.put(key, result)
+    return result
+
+
+def convert_all_to_datetime(date_vals: list, zone: tzinfo | None = None) -> list:
+    """Change a list of strings to datetimes, using None for invalid values.
+    Each distinct value is only converted once."""
+    converted = {}
+    results = []
+    for date_val in date_vals:
+        key = str(date_val)
+        if key not in converted:
+            try:
+                converted[key] = in_zone(convert_to_datetime(key), zone)
+            except ValueError:
+                converted[key] = None
+        results.append(converted[key])
+    return results
+
+
+def format_date(date_val: date) -> str:
+    """Change from a date to a DD.MM.YYYY string"""
+    return f"{date_val.day:02}.{date_val.month:02}.{date_val.year:04}"
 
 
 def get_days_between(first: datetime, last: datetime) -> int:
@@ -21,12 +246,126 @@ def get_days_between(first: datetime, last: datetime) -> int:
 def get_day_of_week_on(date_val: datetime) -> str:
     """Find the name of the day the week is on"""
     if isinstance(date_val, datetime):
-        return date_val.strftime("%A")
+        return WEEKDAY_NAMES[date_val.weekday()]
     raise TypeError("Datetime required.")
 
 
-def get_current_age(birthdate: date) -> int:
-    """Find your current age from your birthday"""
+def get_weekday_counts(first: datetime, last: datetime) -> dict[str, int]:
+    """Find how many of each day of the week there are from the first date
+    up to but not including the last"""
+    days = get_days_between(first, last)
+    if days < 0:
+        raise ValueError("Last date must not be before first date.")
+    weeks, extra = divmod(days, 7)
+    start = first.weekday()
+    return {name: weeks + ((index - start) % 7 < extra)
+            for index, name in enumerate(WEEKDAY_NAMES)}
+
+
+def month_number(date_val: date) -> int:
+    """Find the number of months from the start of year 0 to a date's month"""
+    return date_val.year * 12 + date_val.month - 1
+
+
+def get_range_summary(first: datetime, last: datetime) -> dict:
+    """Find counts of days of each kind from the first date up to but not
+    including the last, without looking at each day"""
+    weekdays = get_weekday_counts(first, last)
+    return {
+        "days": get_days_between(first, last),
+        "weekdays": weekdays,
+        "weekend_days": weekdays["Saturday"] + weekdays["Sunday"],
+        "month_starts": (month_number(last) + (last.day > 1))
+        - (month_number(first) + (first.day > 1)),
+        "month_ends": month_number(last) - month_number(first),
+        "leap_days": (leapdays(first.year, last.year)
+                      + (isleap(last.year) and last.month > 2)
+                      - (isleap(first.year) and first.month > 2)),
+    }
+
+
+def iter_dates(first: datetime, last: datetime, weekday: str | None = None) -> Iterator[date]:
+    """Find each date from the first up to but not including the last, or
+    only those on one day of the week, one at a time"""
+    if last < first:
+        raise ValueError("Last date must not be before first date.")
+    start, step = first.toordinal(), 1
+    if weekday is not None:
+        if weekday not in WEEKDAY_NAMES:
+            raise ValueError(f"Weekday must be one of {', '.join(WEEKDAY_NAMES)}.")
+        start += (WEEKDAY_NAMES.index(weekday) - first.weekday()) % 7
+        step = 7
+    return map(date.fromordinal, range(start, last.toordinal(), step))
+
+
+def convert_to_date(date_val: str, zone: tzinfo | None = None) -> date:
+    """Change from a string to a date in zone"""
+    try:
+        return in_zone(convert_to_datetime(date_val), zone).date()
+    except ValueError as error:
+        raise ValueError("Unable to convert value to date.") from error
+
+
+def parse_instant(value: str) -> int:
+    """Find the epoch seconds of a number of epoch seconds, or of an ISO 8601
+    time, which is local time if it has no time zone"""
+    if EPOCH_SECONDS.fullmatch(value):
+        return int(value)
+    try:
+        return int(datetime.fromisoformat(value).timestamp())
+    except (OverflowError, OSError) as error:
+        raise ValueError(f"Time out of range: {value}") from error
+
+
+def next_midnight(zone: tzinfo | None = None) -> float:
+    """Find the epoch time of the start of tomorrow, local time or in zone"""
+    if zone is None:
+        tomorrow = date.today() + timedelta(days=1)
+        return datetime.combine(tomorrow, day_start()).timestamp()
+    tomorrow = datetime.now(zone).date() + timedelta(days=1)
+    return datetime.combine(tomorrow, day_start(), zone).timestamp()
+
+
+class Today:
+    """Today's date, looked up at most once a day, and the ages already
+    worked out today."""
+
+    def __init__(self):
+        self.ages = {}
+        self._date = date.today()
+        self._until = next_midnight()
+
+    def get(self) -> date:
+        """Returns today's date, clearing the ages when the day changes."""
+        if time() >= self._until:
+            self._date = date.today()
+            self._until = next_midnight()
+            self.ages = {}
+        return self._date
+
+    def age(self, birthdate: date, zone: tzinfo | None = None) -> int:
+        """Returns the age today, local time or in zone, of someone born on
+        birthdate."""
+        if zone is not None:
+            now = datetime.now(zone)
+            return now.year - birthdate.year - (
+                (now.month, now.day) < (birthdate.month, birthdate.day))
+        now = self.get()
+        ages = self.ages
+        age = ages.get(birthdate)
+        if age is None:
+            age = now.year - birthdate.year - (
+                (now.month, now.day) < (birthdate.month, birthdate.day))
+            if len(ages) < AGE_CACHE_SIZE:
+                ages[birthdate] = age
+        return age
+
+
+today = Today()
+
+
+def get_current_age(birthdate: date, zone: tzinfo | None = None) -> int:
+    """Find your current age from your birthday, today in zone"""
     if isinstance(birthdate, date):
-        return int((date.today() - birthdate).days//365.25)
+        return today.age(birthdate, zone)
     raise TypeError("Date required.")
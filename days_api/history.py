@@ -0,0 +1,693 @@
+"""This file defines the stores for the API request history."""
+
+import atexit
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left, insort
+from datetime import datetime
+from fcntl import flock, LOCK_EX, LOCK_UN
+from functools import lru_cache
+from itertools import chain
+from sys import intern
+from threading import Event, Lock, Thread
+from time import time
+
+DEFAULT_CAPACITY = 1000
+SEGMENT_RECORDS = 65536
+FLUSH_RECORDS = 64
+FLUSH_INTERVAL = 0.5
+
+# Header: magic, capacity, total appended, total appended at last clear
+HEADER = struct.Struct("<8sqqq")
+# Record: sequence number, epoch seconds, method, route
+RECORD = struct.Struct("<qq8s32s")
+MAGIC = b"DAYSHST2"
+WRITING = -1
+# Lock file: the number of times the log has been cleared
+GENERATION = struct.Struct("<q")
+# Seconds in each bucket that history counts can be aggregated into
+BUCKETS = {"minute": 60, "hour": 3600}
+
+
+@lru_cache(maxsize=256)
+def format_minute(minute: int) -> str:
+    """Returns the local time of a minute since the epoch."""
+    return datetime.fromtimestamp(minute * 60).strftime("%d/%m/%Y %H:%M")
+
+
+def format_entry(method: str, at: int, route: str | None) -> dict:
+    """Returns a history entry in its API form."""
+    return {
+        "method": method,
+        "at": format_minute(at // 60),
+        "route": route
+    }
+
+
+class HistoryIndex:  # pylint: disable = too-many-instance-attributes
+    """Secondary indexes over a run of history entries, by sequence number.
+
+    The time and the (method, route) pair of every entry are kept in
+    arrays in sequence order, and each route, method and pair keeps the
+    sequence numbers of its entries. Filtering by any of them, or by time,
+    takes binary searches rather than a scan, and pages end at a sequence
+    number, which serves as the cursor for the next page. Times are taken
+    to increase with sequence numbers, as they do when appended.
+
+    Counts of each pair per minute are kept as entries are added and
+    dropped, so aggregating costs one step per minute and pair in range.
+
+    Adding an entry only appends to what is there, so one writer can add
+    entries while others read, provided nothing trims or resets the index
+    they read; trimmed returns a new index instead."""
+
+    def __init__(self, first: int = 0):
+        self.reset(first)
+
+    def reset(self, first: int = 0) -> None:
+        """Drops every entry, so that the next starts at sequence number first."""
+        self.first = first
+        self._times = array("q")
+        self._codes = array("l")
+        self._pairs = []
+        # (method, route) -> its code, and the sequence numbers of its
+        # pair, its route and its method, which it shares with other pairs
+        self._pair_lists = {}
+        self._by_pair = []
+        self._by_route = {}
+        self._by_method = {}
+        self._minutes = array("q")
+        self._counts = {}
+
+    @property
+    def end(self) -> int:
+        """The sequence number after the last entry."""
+        return self.first + len(self._times)
+
+    def _add_pair(self, method: str, route: str | None) -> tuple:
+        """Returns the code and sequence number lists for a new pair."""
+        self._by_pair.append(array("q"))
+        lists = self._pair_lists[(method, route)] = (
+            len(self._pairs), self._by_pair[-1],
+            self._by_route.setdefault(route, array("q")),
+            self._by_method.setdefault(method, array("q")))
+        self._pairs.append((method, route))
+        return lists
+
+    def add(self, seq: int, at: int, method: str, route: str | None) -> None:
+        """Adds the entry with the next sequence number. If entries were
+        skipped, the index starts again from seq."""
+        if seq != self.first + len(self._times):
+            self.reset(seq)
+        lists = self._pair_lists.get((method, route)) or self._add_pair(method, route)
+        code = lists[0]
+        # Codes first, as readers take the end from the times
+        self._codes.append(code)
+        self._times.append(at)
+        lists[1].append(seq)
+        lists[2].append(seq)
+        lists[3].append(seq)
+        counts = self._counts.get(at // 60)
+        if counts is None:
+            counts = self._counts[at // 60] = {}
+            insort(self._minutes, at // 60)
+        counts[code] = counts.get(code, 0) + 1
+
+    def trim(self, first: int) -> None:
+        """Drops the entries before sequence number first."""
+        if first >= self.end:
+            self.reset(max(first, self.first))
+            return
+        drop = first - self.first
+        if drop <= 0:
+            return
+        for at, code in zip(self._times[:drop], self._codes[:drop]):
+            counts = self._counts[at // 60]
+            counts[code] -= 1
+            if not counts[code]:
+                del counts[code]
+                if not counts:
+                    del self._counts[at // 60]
+                    del self._minutes[bisect_left(self._minutes, at // 60)]
+        del self._times[:drop]
+        del self._codes[:drop]
+        for seqs in chain(self._by_pair, self._by_route.values(), self._by_method.values()):
+            del seqs[:bisect_left(seqs, first)]
+        self.first = first
+
+    def trimmed(self, first: int) -> "HistoryIndex":
+        """Returns a new index of the entries from sequence number first,
+        leaving this one as it is for readers still using it."""
+        index = HistoryIndex(first)
+        for seq in range(max(first, self.first), self.end):
+            method, route = self._pairs[self._codes[seq - self.first]]
+            index.add(seq, self._times[seq - self.first], method, route)
+        return index
+
+    def _seqs(self, route: str | None, method: str | None) -> array | range:
+        """Returns the sequence numbers of the entries for a route and method."""
+        if route is not None and method is not None:
+            lists = self._pair_lists.get((method, route))
+            return array("q") if lists is None else lists[1]
+        if route is not None:
+            return self._by_route.get(route, array("q"))
+        if method is not None:
+            return self._by_method.get(method, array("q"))
+        return range(self.first, self.end)
+
+    def _entry(self, seq: int) -> dict:
+        """Returns the entry with a sequence number in its API form."""
+        method, route = self._pairs[self._codes[seq - self.first]]
+        return format_entry(method, self._times[seq - self.first], route)
+
+    def find(self, number: int, *, route: str | None = None, method: str | None = None,  # pylint: disable = too-many-arguments
+             since: int | None = None, until: int | None = None,
+             before: int | None = None, first: int | None = None
+             ) -> tuple[list[dict], int | None]:
+        """Returns up to number entries for a route and method from since up
+        to but not including until, most recent first, stopping before
+        sequence number before and at sequence number first if given. Also
+        returns the cursor for the next page, or None if there is none."""
+        low = self.first if since is None else self.first + bisect_left(self._times, since)
+        high = self.end if until is None else self.first + bisect_left(self._times, until)
+        if before is not None:
+            high = min(high, before)
+        if first is not None:
+            low = max(low, first)
+        seqs = self._seqs(route, method)
+        start, stop = bisect_left(seqs, low), bisect_left(seqs, high)
+        page = seqs[max(start, stop - number):stop][::-1]
+        cursor = page[-1] if page and stop - number > start else None
+        return [self._entry(seq) for seq in page], cursor
+
+    def _skipped(self, first: int) -> tuple[int, dict]:
+        """Returns the minute of the entry with sequence number first, and
+        the number of entries of each pair in that minute before it."""
+        minute = self._times[first - self.first] // 60
+        skipped = {}
+        for code in self._codes[bisect_left(self._times, minute * 60):first - self.first]:
+            skipped[code] = skipped.get(code, 0) + 1
+        return minute, skipped
+
+    def count(self, bucket: int = 60, *, route: str | None = None,  # pylint: disable = too-many-arguments
+              method: str | None = None, since: int | None = None,
+              until: int | None = None, first: int | None = None) -> list[dict]:
+        """Returns the number of entries for each route and method in each
+        bucket of seconds, a whole number of minutes, most recent first,
+        counting from sequence number first if given.
+
+        Whole minutes are counted, including those since and until fall in."""
+        start = 0 if since is None else bisect_left(self._minutes, since // 60)
+        stop = len(self._minutes) if until is None else bisect_left(self._minutes, -(-until // 60))
+        boundary, skipped = None, {}
+        if first is not None and first > self.first:
+            if first >= self.end:
+                return []
+            boundary, skipped = self._skipped(first)
+            start = max(start, bisect_left(self._minutes, boundary))
+        totals = {}
+        for minute in self._minutes[start:stop]:
+            # Copied, as a writer may add to the latest minute meanwhile
+            for code, count in tuple(self._counts[minute].items()):
+                if minute == boundary:
+                    count -= skipped.get(code, 0)
+                    if not count:
+                        continue
+                pair = self._pairs[code]
+                if method in (None, pair[0]) and route in (None, pair[1]):
+                    key = (minute * 60 // bucket, code)
+                    totals[key] = totals.get(key, 0) + count
+        return [{"at": format_minute(bucket_start * bucket // 60),
+                 "method": self._pairs[code][0],
+                 "route": self._pairs[code][1],
+                 "count": count}
+                for (bucket_start, code), count
+                in sorted(totals.items(), key=lambda item: (-item[0][0], item[0][1]))]
+
+
+class HistoryStore:  # pylint: disable = too-many-instance-attributes
+    """A fixed-capacity ring buffer of API requests.
+
+    Entries are kept in parallel arrays, so appending and reading the
+    latest entries cost the same however long the API has been running.
+    Writers take a lock; readers never do, and instead check each slot's
+    sequence number to skip entries that were overwritten mid-read.
+    Entries are also indexed as they are appended, for queries. These
+    don't take the lock either, and skip the overwritten entries the
+    index still holds; writers replace the index rather than trim it."""
+
+    __slots__ = ("capacity", "_methods", "_routes", "_times", "_seqs",
+                 "_cursor", "_lock", "_index")
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1.")
+        self.capacity = capacity
+        self._methods = [""] * capacity
+        self._routes = [""] * capacity
+        self._times = array("q", [0]) * capacity
+        self._seqs = array("q", [WRITING]) * capacity
+        # (total appended, total appended at last clear), replaced as a whole
+        self._cursor = (0, 0)
+        self._lock = Lock()
+        self._index = HistoryIndex()
+
+    def __len__(self) -> int:
+        count, start = self._cursor
+        return min(count - start, self.capacity)
+
+    def append(self, method: str, route: str | None, at: int | None = None) -> None:
+        """Records a request, overwriting the oldest entry when full."""
+        with self._lock:
+            count, start = self._cursor
+            index = count % self.capacity
+            method = intern(method)
+            route = intern(route) if route else route
+            at = int(time() if at is None else at)
+            self._seqs[index] = WRITING
+            self._methods[index] = method
+            self._routes[index] = route
+            self._times[index] = at
+            self._seqs[index] = count
+            self._cursor = (count + 1, start)
+            self._index.add(count, at, method, route)
+            # Overwritten entries are dropped from the index a capacity at a time
+            if count - self._index.first >= 2 * self.capacity:
+                self._index = self._index.trimmed(count + 1 - self.capacity)
+
+    def latest(self, number: int) -> list[dict]:
+        """Returns up to number entries, most recent first."""
+        count, start = self._cursor
+        entries = []
+        for seq in range(count - 1, max(start, count - self.capacity, count - number) - 1, -1):
+            index = seq % self.capacity
+            before = self._seqs[index]
+            method = self._methods[index]
+            route = self._routes[index]
+            at = self._times[index]
+            if before != seq or self._seqs[index] != seq:
+                break
+            entries.append(format_entry(method, at, route))
+        return entries
+
+    def query(self, number: int, *, route: str | None = None, method: str | None = None,  # pylint: disable = too-many-arguments
+              since: int | None = None, until: int | None = None,
+              before: int | None = None) -> tuple[list[dict], int | None]:
+        """Returns a page of entries for a route and method between two
+        times, and the cursor for the next page; see HistoryIndex.find."""
+        count, start = self._cursor
+        return self._index.find(number, route=route, method=method, since=since, until=until,
+                                before=before, first=max(start, count - self.capacity))
+
+    def aggregate(self, bucket: int = 60, *, route: str | None = None,
+                  method: str | None = None, since: int | None = None,
+                  until: int | None = None) -> list[dict]:
+        """Returns counts of entries per bucket; see HistoryIndex.count."""
+        count, start = self._cursor
+        return self._index.count(bucket, route=route, method=method, since=since, until=until,
+                                 first=max(start, count - self.capacity))
+
+    def clear(self) -> None:
+        """Removes all entries."""
+        with self._lock:
+            count, _ = self._cursor
+            self._cursor = (count, count)
+            self._index = HistoryIndex(count)
+
+    def close(self) -> None:
+        """Does nothing; the history only lives in memory."""
+
+
+class MmapHistoryStore:
+    """A fixed-capacity ring buffer of API requests kept in a memory-mapped
+    file, so that every worker process sharing the file sees one history.
+
+    Writers lock the file; readers never do, and instead check each
+    record's sequence number before and after reading it. Each process
+    indexes the records written since its last query when it next queries."""
+
+    def __init__(self, path: str, capacity: int = DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1.")
+        self._lock = Lock()
+        self._file = open(path, "a+b")  # pylint: disable = consider-using-with
+        self._lock_file()
+        try:
+            self._file.seek(0)
+            header = self._file.read(HEADER.size)
+            if len(header) == HEADER.size and header.startswith(MAGIC):
+                capacity = HEADER.unpack(header)[1]
+            else:
+                self._file.truncate(0)
+                self._file.write(HEADER.pack(MAGIC, capacity, 0, 0))
+                self._file.write(RECORD.pack(WRITING, 0, b"", b"") * capacity)
+                self._file.flush()
+        finally:
+            self._unlock_file()
+        self.capacity = capacity
+        self._map = mmap.mmap(self._file.fileno(), HEADER.size + RECORD.size * capacity)
+        self._index = HistoryIndex()
+
+    def _lock_file(self) -> None:
+        flock(self._file.fileno(), LOCK_EX)
+
+    def _unlock_file(self) -> None:
+        flock(self._file.fileno(), LOCK_UN)
+
+    def _cursor(self) -> tuple[int, int]:
+        _, _, count, start = HEADER.unpack_from(self._map, 0)
+        return count, start
+
+    def _set_cursor(self, count: int, start: int) -> None:
+        HEADER.pack_into(self._map, 0, MAGIC, self.capacity, count, start)
+
+    def __len__(self) -> int:
+        count, start = self._cursor()
+        return min(count - start, self.capacity)
+
+    def append(self, method: str, route: str | None, at: int | None = None) -> None:
+        """Records a request, overwriting the oldest entry when full."""
+        with self._lock:
+            self._lock_file()
+            try:
+                count, start = self._cursor()
+                offset = HEADER.size + RECORD.size * (count % self.capacity)
+                struct.pack_into("<q", self._map, offset, WRITING)
+                RECORD.pack_into(self._map, offset, WRITING,
+                                 int(time() if at is None else at),
+                                 method.encode(), (route or "").encode())
+                struct.pack_into("<q", self._map, offset, count)
+                self._set_cursor(count + 1, start)
+            finally:
+                self._unlock_file()
+
+    def latest(self, number: int) -> list[dict]:
+        """Returns up to number entries, most recent first."""
+        count, start = self._cursor()
+        entries = []
+        for seq in range(count - 1, max(start, count - self.capacity, count - number) - 1, -1):
+            offset = HEADER.size + RECORD.size * (seq % self.capacity)
+            before, at, method, route = RECORD.unpack_from(self._map, offset)
+            if before != seq or struct.unpack_from("<q", self._map, offset)[0] != seq:
+                break
+            route = route.rstrip(b"\0").decode()
+            entries.append(format_entry(intern(method.rstrip(b"\0").decode()), at,
+                                        intern(route) if route else None))
+        return entries
+
+    def _update_index(self) -> None:
+        """Indexes the records written by any process since the last update."""
+        count, start = self._cursor()
+        if self._index.end > count:
+            self._index.reset()
+        self._index.trim(max(start, count - self.capacity))
+        for seq in range(self._index.end, count):
+            offset = HEADER.size + RECORD.size * (seq % self.capacity)
+            before, at, method, route = RECORD.unpack_from(self._map, offset)
+            if before != seq or struct.unpack_from("<q", self._map, offset)[0] != seq:
+                break
+            route = route.rstrip(b"\0").decode()
+            self._index.add(seq, at, intern(method.rstrip(b"\0").decode()),
+                            intern(route) if route else None)
+
+    def query(self, number: int, *, route: str | None = None, method: str | None = None,  # pylint: disable = too-many-arguments
+              since: int | None = None, until: int | None = None,
+              before: int | None = None) -> tuple[list[dict], int | None]:
+        """Returns a page of entries for a route and method between two
+        times, and the cursor for the next page; see HistoryIndex.find."""
+        with self._lock:
+            self._update_index()
+            return self._index.find(number, route=route, method=method, since=since,
+                                    until=until, before=before)
+
+    def aggregate(self, bucket: int = 60, *, route: str | None = None,
+                  method: str | None = None, since: int | None = None,
+                  until: int | None = None) -> list[dict]:
+        """Returns counts of entries per bucket; see HistoryIndex.count."""
+        with self._lock:
+            self._update_index()
+            return self._index.count(bucket, route=route, method=method, since=since,
+                                     until=until)
+
+    def clear(self) -> None:
+        """Removes all entries."""
+        with self._lock:
+            self._lock_file()
+            try:
+                count, _ = self._cursor()
+                self._set_cursor(count, count)
+            finally:
+                self._unlock_file()
+
+    def close(self) -> None:
+        """Releases the memory map and the file."""
+        self._map.close()
+        self._file.close()
+
+
+class LogHistoryStore:  # pylint: disable = too-many-instance-attributes
+    """A durable history kept as an append-only log of fixed-size records,
+    split into segment files of SEGMENT_RECORDS records each.
+
+    Appends are buffered and written, then fsync'd, in groups of
+    flush_records or every flush_interval seconds, whichever comes first.
+    Appends only take the lock on the buffer, and a full buffer wakes a
+    background thread to write it, so that appends never wait for the
+    disk. Reads don't wait for it either: a version, odd while a group is
+    being written, tells them when to read again.
+    Reads memory-map the newest segments and read the last records
+    without scanning the log. Queries first index the records written,
+    by any process, since the last query. Clearing deletes the segment
+    files."""
+
+    def __init__(self, directory: str, flush_records: int = FLUSH_RECORDS,
+                 flush_interval: float = FLUSH_INTERVAL,
+                 segment_records: int = SEGMENT_RECORDS):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.flush_records = flush_records
+        self.segment_records = segment_records
+        self._pending = []
+        # The group being written, where its first record goes, and the version
+        self._writing = []
+        self._write_start = (0, 0)
+        self._version = 0
+        self._lock = Lock()
+        self._write_lock = Lock()
+        self._lock_file = os.fdopen(os.open(os.path.join(directory, "history.lock"),  # pylint: disable = consider-using-with
+                                            os.O_RDWR | os.O_CREAT), "r+b")
+        self._stopped = Event()
+        self._wake = Event()
+        self._index = HistoryIndex()
+        self._index_lock = Lock()
+        # The generation of the log the index holds, to notice clears elsewhere
+        self._generation = None
+        Thread(target=self._flush_periodically, args=(flush_interval,),
+               daemon=True).start()
+        atexit.register(self.close)
+
+    def _segments(self) -> list[int]:
+        """Returns the indexes of the segment files, oldest first."""
+        return sorted(int(name[8:-4]) for name in os.listdir(self.directory)
+                      if name.startswith("history-") and name.endswith(".log"))
+
+    def _segment_path(self, index: int) -> str:
+        return os.path.join(self.directory, f"history-{index:08d}.log")
+
+    def _flush_periodically(self, interval: float) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(interval)
+            self._wake.clear()
+            self.flush()
+
+    def __len__(self) -> int:
+        total = 0
+        for index in self._segments():
+            try:
+                total += os.path.getsize(self._segment_path(index)) // RECORD.size
+            except FileNotFoundError:
+                pass
+        return total + len(self._writing) + len(self._pending)
+
+    def append(self, method: str, route: str | None, at: int | None = None) -> None:
+        """Records a request, waking the flusher when a group is complete."""
+        with self._lock:
+            self._pending.append((int(time() if at is None else at),
+                                  intern(method), intern(route) if route else route))
+            if len(self._pending) < self.flush_records:
+                return
+        self._wake.set()
+
+    def flush(self) -> None:
+        """Writes and fsyncs any buffered records."""
+        with self._write_lock:
+            with self._lock:
+                if not self._pending or self._lock_file.closed:
+                    return
+                pending = self._writing = self._pending
+                self._pending = []
+            flock(self._lock_file.fileno(), LOCK_EX)
+            try:
+                segments = self._segments()
+                index = segments[-1] if segments else 0
+                position = 0
+                if segments:
+                    position = os.path.getsize(self._segment_path(index)) // RECORD.size
+                with self._lock:
+                    self._write_start = (index, position)
+                    self._version += 1
+                while pending:
+                    if position >= self.segment_records:
+                        index, position = index + 1, 0
+                    group = pending[:self.segment_records - position]
+                    pending = pending[len(group):]
+                    with open(self._segment_path(index), "ab") as segment:
+                        segment.write(b"".join(
+                            RECORD.pack(index * self.segment_records + position + offset,
+                                        at, method.encode(), (route or "").encode())
+                            for offset, (at, method, route) in enumerate(group)))
+                        segment.flush()
+                        os.fsync(segment.fileno())
+                    position += len(group)
+            finally:
+                with self._lock:
+                    self._version += self._version % 2
+                    self._writing = []
+                flock(self._lock_file.fileno(), LOCK_UN)
+
+    def _read_tail(self, index: int, number: int, end: int | None = None) -> list[dict]:
+        """Returns up to number of the last records in a segment, before
+        position end if given, newest first."""
+        try:
+            with open(self._segment_path(index), "rb") as segment:
+                size = os.fstat(segment.fileno()).st_size // RECORD.size
+                if end is not None:
+                    size = min(size, end)
+                if size == 0:
+                    return []
+                with mmap.mmap(segment.fileno(), size * RECORD.size,
+                               access=mmap.ACCESS_READ) as data:
+                    entries = []
+                    for position in range(size - 1, max(size - number, 0) - 1, -1):
+                        _, at, method, route = RECORD.unpack_from(data, position * RECORD.size)
+                        route = route.rstrip(b"\0").decode()
+                        entries.append(format_entry(intern(method.rstrip(b"\0").decode()),
+                                                    at, intern(route) if route else None))
+                    return entries
+        except FileNotFoundError:
+            return []
+
+    def latest(self, number: int) -> list[dict]:
+        """Returns up to number entries, most recent first.
+
+        The buffered records are read with the log up to where the group
+        being written, if any, starts, and read again if a group starts or
+        finishes being written meanwhile, so that none is read twice."""
+        while True:
+            with self._lock:
+                version, (start, position) = self._version, self._write_start
+                pending = (self._writing + self._pending)[-number:]
+            entries = [format_entry(method, at, route)
+                       for at, method, route in reversed(pending)]
+            for index in reversed(self._segments()):
+                if len(entries) >= number:
+                    break
+                if version % 2 and index >= start:
+                    if index == start:
+                        entries += self._read_tail(index, number - len(entries), position)
+                    continue
+                entries += self._read_tail(index, number - len(entries))
+            if self._version == version:
+                return entries
+
+    def _read_generation(self) -> int:
+        """Returns the number of times any process has cleared the log."""
+        data = os.pread(self._lock_file.fileno(), GENERATION.size, 0)
+        return GENERATION.unpack(data)[0] if len(data) == GENERATION.size else 0
+
+    def _update_index(self) -> None:
+        """Writes any buffered records, then indexes the records written by
+        any process since the last update, starting again if the log has
+        been cleared since."""
+        self.flush()
+        generation = self._read_generation()
+        segments = self._segments()
+        if generation != self._generation:
+            self._index.reset(segments[0] * self.segment_records if segments else 0)
+            self._generation = generation
+        for index in segments:
+            if (index + 1) * self.segment_records <= self._index.end:
+                continue
+            try:
+                with open(self._segment_path(index), "rb") as segment:
+                    segment.seek(max(self._index.end - index * self.segment_records, 0)
+                                 * RECORD.size)
+                    data = segment.read()
+            except FileNotFoundError:
+                return
+            data = data[:len(data) - len(data) % RECORD.size]
+            for seq, at, method, route in RECORD.iter_unpack(data):
+                route = route.rstrip(b"\0").decode()
+                self._index.add(seq, at, intern(method.rstrip(b"\0").decode()),
+                                intern(route) if route else None)
+
+    def query(self, number: int, *, route: str | None = None, method: str | None = None,  # pylint: disable = too-many-arguments
+              since: int | None = None, until: int | None = None,
+              before: int | None = None) -> tuple[list[dict], int | None]:
+        """Returns a page of entries for a route and method between two
+        times, and the cursor for the next page; see HistoryIndex.find."""
+        with self._index_lock:
+            self._update_index()
+            return self._index.find(number, route=route, method=method, since=since,
+                                    until=until, before=before)
+
+    def aggregate(self, bucket: int = 60, *, route: str | None = None,
+                  method: str | None = None, since: int | None = None,
+                  until: int | None = None) -> list[dict]:
+        """Returns counts of entries per bucket; see HistoryIndex.count."""
+        with self._index_lock:
+            self._update_index()
+            return self._index.count(bucket, route=route, method=method, since=since,
+                                     until=until)
+
+    def clear(self) -> None:
+        """Removes all entries by deleting the log segments, and counts a new
+        generation so that every process's index starts again."""
+        with self._index_lock, self._write_lock, self._lock:
+            self._pending = []
+            flock(self._lock_file.fileno(), LOCK_EX)
+            try:
+                for index in self._segments():
+                    os.remove(self._segment_path(index))
+                self._generation = self._read_generation() + 1
+                os.pwrite(self._lock_file.fileno(), GENERATION.pack(self._generation), 0)
+            finally:
+                flock(self._lock_file.fileno(), LOCK_UN)
+            self._index.reset()
+
+    def close(self) -> None:
+        """Writes any buffered records and stops the background flusher."""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._wake.set()
+        self.flush()
+        with self._write_lock:
+            self._lock_file.close()
+        atexit.unregister(self.close)
+
+
+def open_history(backend: str = "memory", capacity: int = DEFAULT_CAPACITY,
+                 path: str | None = None) -> HistoryStore | MmapHistoryStore | LogHistoryStore:
+    """Returns the history store for the named backend.
+
+    The log backend keeps every request, so capacity does not apply to it."""
+    if backend == "memory":
+        return HistoryStore(capacity)
+    if backend == "mmap":
+        return MmapHistoryStore(path or os.path.join(os.getcwd(), "history.bin"), capacity)
+    if backend == "log":
+        return LogHistoryStore(path or os.path.join(os.getcwd(), "history"))
+    raise ValueError(f"Unknown history backend: {backend}")
@@ -0,0 +1,56 @@
+"""This file defines a faster JSON provider for the API.
+
+orjson is used when it is installed; otherwise Flask's own provider,
+built on the standard library, is used unchanged."""
+
+# pylint: disable = no-member
+
+from typing import Any
+
+from flask import Flask, Response
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Serialises and parses JSON with orjson.
+
+    Types orjson does not handle itself, including dates, fall back to
+    Flask's default conversion so the output matches the standard
+    provider, except that text outside ASCII is written as UTF-8 rather
+    than escaped. Calls with extra json.dumps arguments use the standard
+    library."""
+
+    def _options(self) -> int:
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode()
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        if self._app.debug or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default,
+                            option=self._options() | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def init_json(app: Flask, provider: str = "fast") -> None:
+    """Uses the fast JSON provider for app if asked for and available."""
+    if provider == "fast" and orjson is not None:
+        app.json = FastJSONProvider(app)
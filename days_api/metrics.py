@@ -0,0 +1,98 @@
+"""This file records request metrics and renders them for Prometheus."""
+
+from bisect import bisect_left
+from threading import Lock
+from time import perf_counter
+
+from flask import Flask, g, request
+
+# Upper bounds, in seconds, of the latency histogram buckets
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class RouteMetrics:  # pylint: disable = too-few-public-methods
+    """Request counts and a latency histogram for one route."""
+
+    __slots__ = ("buckets", "count", "total", "statuses")
+
+    def __init__(self, size: int):
+        self.buckets = [0] * (size + 1)
+        self.count = 0
+        self.total = 0.0
+        self.statuses = {}
+
+
+class Metrics:
+    """Per-route request counts, status counts and latency histograms.
+
+    Memory use is fixed by the number of routes and status codes, not by
+    the number of requests."""
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS):
+        self.bucket_bounds = buckets
+        self.routes = {}
+        self._lock = Lock()
+
+    def observe(self, route: str, status: int, seconds: float) -> None:
+        """Records one request."""
+        with self._lock:
+            metrics = self.routes.get(route)
+            if metrics is None:
+                metrics = self.routes[route] = RouteMetrics(len(self.bucket_bounds))
+            metrics.buckets[bisect_left(self.bucket_bounds, seconds)] += 1
+            metrics.count += 1
+            metrics.total += seconds
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+
+    def clear(self) -> None:
+        """Removes all recorded requests."""
+        with self._lock:
+            self.routes = {}
+
+    def render(self, extra: dict[str, int] | None = None) -> str:
+        """Returns the metrics in the Prometheus text format.
+
+        extra maps further counter names to their values."""
+        with self._lock:
+            routes = sorted(self.routes.items())
+            lines = ["# HELP days_api_requests_total Requests handled, by route and status.",
+                     "# TYPE days_api_requests_total counter"]
+            for route, metrics in routes:
+                for status, count in sorted(metrics.statuses.items()):
+                    lines.append(f'days_api_requests_total{{route="{route}",'
+                                 f'status="{status}"}} {count}')
+
+            lines += ["# HELP days_api_request_duration_seconds Request latency, by route.",
+                      "# TYPE days_api_request_duration_seconds histogram"]
+            for route, metrics in routes:
+                cumulative = 0
+                bounds = [str(bound) for bound in self.bucket_bounds] + ["+Inf"]
+                for bound, count in zip(bounds, metrics.buckets):
+                    cumulative += count
+                    lines.append(f'days_api_request_duration_seconds_bucket{{route="{route}",'
+                                 f'le="{bound}"}} {cumulative}')
+                lines.append(f'days_api_request_duration_seconds_sum{{route="{route}"}} '
+                             f'{metrics.total:.6f}')
+                lines.append(f'days_api_request_duration_seconds_count{{route="{route}"}} '
+                             f'{metrics.count}')
+
+        for name, value in (extra or {}).items():
+            lines += [f"# TYPE {name} counter", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+def init_metrics(app: Flask, metrics: Metrics) -> None:
+    """Registers request hooks that record every request in metrics."""
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.get("metrics_start")
+        if start is not None:
+            metrics.observe(request.endpoint or "unmatched", response.status_code,
+                            perf_counter() - start)
+        return response
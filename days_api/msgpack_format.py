@@ -0,0 +1,115 @@
+"""This file lets clients send and receive MessagePack instead of JSON.
+
+Request bodies with a MessagePack content type are decoded wherever the
+API reads JSON, and responses are encoded as MessagePack when the Accept
+header prefers it. Dates and datetimes are sent as MessagePack
+timestamps, which take 4 bytes for any day from 1970 to 2106."""
+
+import json
+from datetime import date, datetime, time as day_start, timezone
+from functools import cached_property, lru_cache
+from typing import Any
+
+import msgpack
+from flask import Flask, Request, Response, request
+from flask.json.provider import DefaultJSONProvider
+
+from json_provider import FastJSONProvider
+
+MIMETYPE = "application/msgpack"
+MIMETYPES = (MIMETYPE, "application/x-msgpack")
+
+
+def packb(obj: Any) -> bytes:
+    """Returns the MessagePack encoding of obj."""
+    return msgpack.packb(obj, datetime=True, default=naive_to_utc)
+
+
+def reject_extension(code: int, _: bytes) -> Any:
+    """Rejects the extension types other than timestamps, which the API never sends."""
+    raise ValueError(f"Unsupported MessagePack extension: {code}")
+
+
+def unpackb(data: bytes) -> Any:
+    """Returns the value encoded in MessagePack data, raising ValueError if
+    it is invalid."""
+    try:
+        return msgpack.unpackb(data, timestamp=3, strict_map_key=False,
+                               ext_hook=reject_extension)
+    except (ValueError, TypeError, OverflowError) as error:
+        raise ValueError("Invalid MessagePack data.") from error
+
+
+def naive_to_utc(obj: Any) -> Any:
+    """Converts the dates and naive datetimes msgpack cannot encode itself."""
+    if isinstance(obj, datetime):
+        return obj.replace(tzinfo=timezone.utc)
+    if isinstance(obj, date):
+        return datetime.combine(obj, day_start(), timezone.utc)
+    raise TypeError(f"Cannot encode {type(obj).__name__} as MessagePack.")
+
+
+@lru_cache(maxsize=64)
+def json_to_msgpack(body: bytes) -> bytes:
+    """Returns a fixed JSON body re-encoded as MessagePack."""
+    return packb(json.loads(body))
+
+
+class ApiRequest(Request):
+    """A request whose body may be MessagePack wherever JSON is accepted."""
+
+    @property
+    def is_json(self) -> bool:
+        return self.mimetype in MIMETYPES or super().is_json
+
+    @cached_property
+    def wants_msgpack(self) -> bool:
+        """Whether the Accept header prefers MessagePack to JSON."""
+        return self.accept_mimetypes.best_match(
+            ("application/json", *MIMETYPES)) in MIMETYPES
+
+    @cached_property
+    def _msgpack(self) -> tuple[Any, ValueError | None]:
+        try:
+            return unpackb(self.get_data()), None
+        except ValueError as error:
+            return None, error
+
+    def get_json(self, force: bool = False, silent: bool = False,
+                 cache: bool = True) -> Any | None:
+        if self.mimetype not in MIMETYPES:
+            return super().get_json(force, silent, cache)
+        value, error = self._msgpack
+        if error is not None and not silent:
+            return self.on_json_loading_failed(error)
+        return value
+
+
+class MsgpackResponseMixin:  # pylint: disable = too-few-public-methods
+    """Makes a JSON provider send MessagePack to clients that prefer it."""
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        """Returns a JSON or, if the client prefers it, MessagePack response."""
+        if not request.wants_msgpack:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(packb(obj), mimetype=MIMETYPE)
+
+
+class MsgpackJSONProvider(MsgpackResponseMixin, DefaultJSONProvider):
+    """Flask's own JSON provider, sending MessagePack when preferred."""
+
+
+class MsgpackFastJSONProvider(MsgpackResponseMixin, FastJSONProvider):
+    """The orjson provider, sending MessagePack when preferred."""
+
+
+PROVIDERS = {DefaultJSONProvider: MsgpackJSONProvider,
+             FastJSONProvider: MsgpackFastJSONProvider}
+
+
+def init_msgpack(app: Flask) -> None:
+    """Makes app read MessagePack request bodies and send MessagePack
+    responses to clients that prefer them."""
+    app.request_class = ApiRequest
+    app.json = PROVIDERS[type(app.json)](app)
@@ -0,0 +1,182 @@
+"""This file limits how often each client may call each route.
+
+Limits are token buckets, one per client (a configured API key, or else
+the IP address) and route. Buckets live in a bounded dict in each
+process, or, to share them across worker processes, in a memory-mapped
+file of fixed-size slots."""
+
+import mmap
+import struct
+from collections import OrderedDict
+from fcntl import flock, LOCK_EX, LOCK_UN
+from hashlib import blake2b
+from math import ceil, isfinite
+from threading import Lock
+from time import monotonic
+
+from flask import Flask, request
+
+API_KEY_HEADER = "X-API-Key"
+IDLE_SECONDS = 300.0
+MAX_BUCKETS = 65536
+SHARED_SLOTS = 65536
+PROBES = 8
+# Slot: key hash, tokens, time of last update
+SLOT = struct.Struct("<Qdd")
+
+
+class TokenBuckets:
+    """Token buckets holding up to burst tokens, refilled at rate per second.
+
+    Buckets left idle for IDLE_SECONDS are full again, so they are
+    dropped and recreated on the next request. When there are max_buckets,
+    the least recently used is dropped to make room for a new one."""
+
+    def __init__(self, rate: float, burst: float, clock=monotonic,
+                 max_buckets: int = MAX_BUCKETS):
+        self.rate = rate
+        self.burst = burst
+        self.max_buckets = max_buckets
+        self._clock = clock
+        self._buckets = OrderedDict()
+        self._lock = Lock()
+        self._next_sweep = clock() + IDLE_SECONDS
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, key: str) -> float:
+        """Takes a token for key, returning 0 if one was available or else
+        the number of seconds until one will be."""
+        now = self._clock()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_buckets:
+                    self._buckets.popitem(last=False)
+                bucket = self._buckets[key] = [self.burst, now]
+            else:
+                self._buckets.move_to_end(key)
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                return 0.0
+            bucket[0] = tokens
+            return (1 - tokens) / self.rate
+
+    def _sweep(self, now: float) -> None:
+        # Buckets are in order of last use, so the idle ones come first
+        idle = now - max(IDLE_SECONDS, self.burst / self.rate)
+        while self._buckets and next(iter(self._buckets.values()))[1] <= idle:
+            self._buckets.popitem(last=False)
+        self._next_sweep = now + IDLE_SECONDS
+
+
+class SharedTokenBuckets:  # pylint: disable = too-few-public-methods
+    """Token buckets kept in a memory-mapped file so that every worker
+    process using the file shares them.
+
+    Keys are hashed into a fixed table of slots. When all the slots a key
+    may use are taken, the least recently used one is reused."""
+
+    def __init__(self, rate: float, burst: float, path: str,
+                 slots: int = SHARED_SLOTS, clock=monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.slots = slots
+        self._clock = clock
+        self._lock = Lock()
+        self._file = open(path, "a+b")  # pylint: disable = consider-using-with
+        flock(self._file.fileno(), LOCK_EX)
+        try:
+            if self._file.seek(0, 2) < SLOT.size * slots:
+                self._file.truncate(SLOT.size * slots)
+        finally:
+            flock(self._file.fileno(), LOCK_UN)
+        self._map = mmap.mmap(self._file.fileno(), SLOT.size * slots)
+
+    def _find(self, key_hash: int, now: float) -> tuple[int, float, float]:
+        """Returns the offset of the slot for a key, with its tokens and time."""
+        oldest, oldest_time = 0, float("inf")
+        for probe in range(PROBES):
+            offset = SLOT.size * ((key_hash + probe) % self.slots)
+            stored, tokens, updated = SLOT.unpack_from(self._map, offset)
+            if stored == key_hash:
+                return offset, tokens, updated
+            if stored == 0 or now - updated > IDLE_SECONDS:
+                return offset, self.burst, now
+            if updated < oldest_time:
+                oldest, oldest_time = offset, updated
+        return oldest, self.burst, now
+
+    def take(self, key: str) -> float:
+        """Takes a token for key, returning 0 if one was available or else
+        the number of seconds until one will be."""
+        key_hash = int.from_bytes(blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+        now = self._clock()
+        with self._lock:
+            flock(self._file.fileno(), LOCK_EX)
+            try:
+                offset, tokens, updated = self._find(key_hash, now)
+                tokens = min(self.burst, tokens + (now - updated) * self.rate)
+                wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+                SLOT.pack_into(self._map, offset, key_hash,
+                               tokens - 1 if tokens >= 1 else tokens, now)
+            finally:
+                flock(self._file.fileno(), LOCK_UN)
+        return wait
+
+
+def parse_limits(spec: str) -> dict[str, tuple[float, float]]:
+    """Returns the (rate per second, burst) limit for each route in a spec
+    such as "between=100/60,default=1000/60", where each limit allows a
+    number of requests per number of seconds, in bursts of up to that number.
+    Both numbers must be positive and finite."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            route, limit = item.split("=")
+            requests, seconds = limit.split("/")
+            requests, seconds = int(requests), float(seconds)
+            if requests < 1 or seconds <= 0 or not isfinite(seconds):
+                raise ValueError(f"Invalid rate limit: {item}")
+            limits[route.strip()] = (requests / seconds, float(requests))
+        except ValueError as error:
+            raise ValueError(f"Invalid rate limit: {item}") from error
+    return limits
+
+
+def parse_api_keys(spec: str) -> frozenset[str]:
+    """Returns the API keys in a comma-separated list."""
+    return frozenset(filter(None, (key.strip() for key in spec.split(","))))
+
+
+def init_rate_limits(app: Flask, limits: dict[str, tuple[float, float]],
+                     path: str | None = None, api_keys: frozenset[str] = frozenset()) -> None:
+    """Registers a hook that answers requests over their route's limit with
+    a 429. The "default" limit applies to routes without their own.
+
+    Clients sending one of api_keys are limited by key; all others, with
+    any other key or none, are limited by IP address."""
+    buckets = {}
+    for route, (rate, burst) in limits.items():
+        if path:
+            buckets[route] = SharedTokenBuckets(rate, burst, f"{path}.{route}")
+        else:
+            buckets[route] = TokenBuckets(rate, burst)
+    default = buckets.get("default")
+
+    @app.before_request
+    def limit_request():
+        bucket = buckets.get(request.endpoint, default)
+        if bucket is None:
+            return None
+        key = request.headers.get(API_KEY_HEADER)
+        client = f"key:{key}" if key in api_keys else f"ip:{request.remote_addr or ''}"
+        wait = bucket.take(client)
+        if wait:
+            return {"error": "Too many requests."}, 429, {"Retry-After": str(ceil(wait))}
+        return None
@@ -0,0 +1,163 @@
+"""This file captures CPU profiles of individual requests on demand.
+
+When profiling is enabled, a request is profiled if it is picked by the
+sampling rate or, when a token is set, carries an X-Profile header and
+the token. Profiles are kept in a bounded store and, when a token is
+set, served from /debug/profiles as a pstats report, a binary .prof
+file or flamegraph-compatible collapsed stacks. When profiling is
+disabled no hooks are registered at all.
+
+    python3 request_profiling.py requests.prof     # print collapsed stacks for a .prof file"""
+
+import cProfile
+import marshal
+import pstats
+import sys
+from collections import Counter, deque
+from io import StringIO
+from random import random
+from threading import Lock
+
+from flask import Flask, Response, g, request
+
+PROFILE_HEADER = "X-Profile"
+TOKEN_HEADER = "X-Profile-Token"
+DEFAULT_SIZE = 100
+MAX_DEPTH = 64
+
+
+class ProfileStore:
+    """A bounded store of request profiles."""
+
+    def __init__(self, maxsize: int = DEFAULT_SIZE):
+        self._profiles = deque(maxlen=maxsize)
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def add(self, route: str, profile: cProfile.Profile) -> None:
+        """Stores the profile of one request, dropping the oldest if full."""
+        profile.create_stats()
+        with self._lock:
+            self._profiles.append((route, profile))
+
+    def stats(self, route: str | None = None) -> pstats.Stats | None:
+        """Returns the stored profiles, optionally for one route, combined."""
+        with self._lock:
+            profiles = [p for r, p in self._profiles if route is None or r == route]
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0], stream=StringIO())
+        for profile in profiles[1:]:
+            stats.add(profile)
+        return stats
+
+    def clear(self) -> None:
+        """Removes all profiles."""
+        with self._lock:
+            self._profiles.clear()
+
+
+def function_name(func: tuple) -> str:
+    """Returns a readable name for a pstats function key."""
+    filename, line, name = func
+    if filename == "~":
+        return name
+    return f"{filename.rsplit('/', 1)[-1]}:{line}:{name}"
+
+
+def collapse(stats: dict) -> str:
+    """Returns pstats data as collapsed stacks, one "a;b;c microseconds" line
+    per stack, for flamegraph tools.
+
+    cProfile only records caller/callee pairs, so time is split between the
+    stacks leading to a function in proportion to each caller's share."""
+    callees = {}
+    for func, (*_, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    stacks = Counter()
+
+    def walk(func: tuple, path: tuple, share: float) -> None:
+        _, _, own, total, _ = stats[func]
+        ratio = share / total if total else 0.0
+        path = path + (function_name(func),)
+        stacks[";".join(path)] += own * ratio
+        if len(path) >= MAX_DEPTH:
+            return
+        for callee, time in callees.get(func, ()):
+            if function_name(callee) not in path:
+                walk(callee, path, time * ratio)
+
+    for func, (*_, total, callers) in stats.items():
+        if not callers:
+            walk(func, (), total)
+    return "".join(f"{stack} {round(time * 1e6)}\n"
+                   for stack, time in stacks.items() if time * 1e6 >= 1)
+
+
+def init_profiling(app: Flask, store: ProfileStore, sample_rate: float = 0.0,
+                   token: str | None = None) -> None:
+    """Registers the hooks that profile requests and, if there is a token
+    for clients to give, the X-Profile header and the /debug/profiles routes."""
+
+    def authorised() -> bool:
+        return token is not None and request.headers.get(TOKEN_HEADER) == token
+
+    @app.before_request
+    def start_profile():
+        # Asking for a profile needs the token too, so that anyone else's
+        # requests cannot push real captures out of the store
+        if (request.headers.get(PROFILE_HEADER) and authorised()) or random() < sample_rate:
+            g.profile = cProfile.Profile()
+            g.profile.enable()
+
+    @app.teardown_request
+    def finish_profile(_):
+        profile = g.pop("profile", None)
+        if profile is not None:
+            profile.disable()
+            store.add(request.endpoint or "unmatched", profile)
+
+    def get_profiles():
+        """Returns the stored profiles in the requested format"""
+        if not authorised():
+            return {"error": "Invalid profile token."}, 403
+        stats = store.stats(request.args.get("route"))
+        if stats is None:
+            return {"error": "No profiles recorded."}, 404
+
+        output = request.args.get("format", "text")
+        if output == "collapsed":
+            return Response(collapse(stats.stats), mimetype="text/plain")
+        if output == "prof":
+            return Response(marshal.dumps(stats.stats),
+                            mimetype="application/octet-stream",
+                            headers={"Content-Disposition":
+                                     "attachment; filename=requests.prof"})
+        if output == "text":
+            stats.stream = StringIO()
+            stats.sort_stats("cumulative").print_stats(50)
+            return Response(stats.stream.getvalue(), mimetype="text/plain")
+        return {"error": "Format must be text, prof or collapsed."}, 400
+
+    def delete_profiles():
+        """Deletes all stored profiles"""
+        if not authorised():
+            return {"error": "Invalid profile token."}, 403
+        store.clear()
+        return {"status": "Profiles cleared"}, 200
+
+    if token is None:
+        return
+    app.add_url_rule("/debug/profiles", "get_profiles", get_profiles, methods=["GET"])
+    app.add_url_rule("/debug/profiles", "delete_profiles", delete_profiles,
+                     methods=["DELETE"])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python3 request_profiling.py <file.prof>")
+    sys.stdout.write(collapse(pstats.Stats(sys.argv[1]).stats))
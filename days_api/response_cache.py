@@ -0,0 +1,61 @@
+"""This file defines a cache of serialised API responses."""
+
+from collections import OrderedDict
+from hashlib import blake2b
+from threading import Lock
+from time import time
+
+DEFAULT_SIZE = 4096
+
+
+class CachedResponse:  # pylint: disable = too-few-public-methods
+    """A serialised response body with its ETag and expiry time."""
+
+    __slots__ = ("body", "etag", "expires")
+
+    def __init__(self, body: bytes, expires: float | None = None):
+        self.body = body
+        self.etag = blake2b(body, digest_size=8).hexdigest()
+        self.expires = expires
+
+
+class ResponseCache:
+    """A bounded least-recently-used cache of responses, keyed on the
+    normalised inputs of a request."""
+
+    def __init__(self, maxsize: int = DEFAULT_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple) -> CachedResponse | None:
+        """Returns the cached response for key, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires is not None and entry.expires <= time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: tuple, body: bytes, expires: float | None = None) -> CachedResponse:
+        """Caches a response body, evicting the least recently used if full."""
+        entry = CachedResponse(body, expires)
+        if self.maxsize < 1:
+            return entry
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        """Removes all entries."""
+        with self._lock:
+            self._entries.clear()
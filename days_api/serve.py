@@ -0,0 +1,160 @@
+"""This file runs the API with several pre-forked worker processes.
+
+The master process opens the listening socket, forks the workers that
+share it, restarts any worker that dies, replaces every worker on SIGHUP,
+and on SIGTERM or SIGINT lets workers finish their in-flight requests
+before exiting."""
+
+import argparse
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+
+from werkzeug.serving import make_server
+
+RESTART_DELAY = 1.0
+SIGNALS = {signal.SIGTERM, signal.SIGINT, signal.SIGHUP}
+
+
+def parse_args(args: list[str] | None = None) -> argparse.Namespace:
+    """Returns the command-line options."""
+    parser = argparse.ArgumentParser(description="Serve the Days API.")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8080)))
+    parser.add_argument("--workers", type=int,
+                        default=int(os.environ.get("WORKERS", os.cpu_count() or 1)),
+                        help="number of worker processes (default: one per core)")
+    parser.add_argument("--backlog", type=int, default=1024)
+    parser.add_argument("--debug", action="store_true",
+                        help="enable Flask debug mode (off by default)")
+    return parser.parse_args(args)
+
+
+def create_socket(host: str, port: int, backlog: int) -> socket.socket:
+    """Returns a listening socket for the workers to share."""
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket, debug: bool) -> None:
+    """Serves requests on the shared socket until told to stop.
+
+    The app is imported here rather than in the master so that each worker
+    opens its own history store and file locks."""
+    from app import app, app_history  # pylint: disable = import-outside-toplevel, no-name-in-module
+
+    app.debug = debug
+    server = make_server(sock.getsockname()[0], sock.getsockname()[1], app,
+                         threaded=True, fd=sock.fileno())
+    # Keep handler threads joinable so server_close() drains them
+    server.daemon_threads = False
+
+    def stop(*_):
+        threading.Thread(target=server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    server.serve_forever()
+    server.server_close()
+    app_history.close()
+
+
+class Master:
+    """Forks and supervises the worker processes."""
+
+    def __init__(self, sock: socket.socket, workers: int, debug: bool):
+        self.sock = sock
+        self.size = workers
+        self.debug = debug
+        self.workers = {}
+        self.retiring = set()
+        self.stopping = False
+
+    def spawn(self) -> None:
+        """Starts one worker process.
+
+        Signals wait until the worker has dropped the master's handlers,
+        which would otherwise handle them in it until it sets its own."""
+        signal.pthread_sigmask(signal.SIG_BLOCK, SIGNALS)
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, SIGNALS)
+            code = 0
+            try:
+                run_worker(self.sock, self.debug)
+            except Exception:  # pylint: disable = broad-exception-caught
+                # os._exit skips the handler that would print the traceback
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stderr.flush()
+                os._exit(code)  # pylint: disable = protected-access
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, SIGNALS)
+        self.workers[pid] = time.monotonic()
+
+    def stop(self, *_) -> None:
+        """Asks every worker to finish its requests and exit."""
+        self.stopping = True
+        for pid in self.workers:
+            os.kill(pid, signal.SIGTERM)
+
+    def reload(self, *_) -> None:
+        """Replaces every worker, starting new ones before stopping old ones."""
+        old = [pid for pid in self.workers if pid not in self.retiring]
+        for pid in old:
+            self.spawn()
+            self.retiring.add(pid)
+            os.kill(pid, signal.SIGTERM)
+
+    def run(self) -> None:
+        """Supervises the workers until they have all exited after a stop."""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGHUP, self.reload)
+
+        for _ in range(self.size):
+            self.spawn()
+
+        while self.workers:
+            try:
+                pid, _ = os.wait()
+            except ChildProcessError:
+                break
+            started = self.workers.pop(pid, None)
+            if started is None:
+                continue
+            if pid in self.retiring:
+                self.retiring.discard(pid)
+            elif not self.stopping:
+                # Back off briefly if a worker is crashing on start-up
+                if time.monotonic() - started < RESTART_DELAY:
+                    time.sleep(RESTART_DELAY)
+                self.spawn()
+
+
+def main(args: list[str] | None = None) -> None:
+    """Starts the server."""
+    options = parse_args(args)
+    sock = create_socket(options.host, options.port, options.backlog)
+    # The port the socket was given, should port 0 have asked for any free one
+    print(f"Serving on {options.host}:{sock.getsockname()[1]} with {options.workers} workers",
+          file=sys.stderr, flush=True)
+    Master(sock, max(options.workers, 1), options.debug).run()
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
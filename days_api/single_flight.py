@@ -0,0 +1,63 @@
+"""This file lets identical requests that arrive together share one answer.
+
+The first request for a key leads a flight and computes the response;
+requests for the same key that arrive before it lands wait for it and
+reuse its result instead of computing it again."""
+
+from threading import Event, Lock
+
+# Seconds a request waits for another's result before working it out itself
+WAIT_TIMEOUT = 5.0
+
+
+class Flight:  # pylint: disable = too-few-public-methods
+    """One computation in progress, and its result once it has landed."""
+
+    __slots__ = ("landed", "result")
+
+    def __init__(self):
+        self.landed = Event()
+        self.result = None
+
+
+class SingleFlight:
+    """The computations in progress, by key, with counts of the flights led
+    and of the requests that shared another's result."""
+
+    def __init__(self, timeout: float = WAIT_TIMEOUT):
+        self.timeout = timeout
+        self.leaders = 0
+        self.coalesced = 0
+        self._flights = {}
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def join(self, key) -> tuple[Flight, bool]:
+        """Returns the flight for key, starting one if there is none, and
+        whether the caller leads it."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = Flight()
+            self.leaders += 1
+            return flight, True
+
+    def wait(self, flight: Flight):
+        """Returns the result of a flight led by another caller, or None if
+        it failed or took too long."""
+        if not flight.landed.wait(self.timeout) or flight.result is None:
+            return None
+        with self._lock:
+            self.coalesced += 1
+        return flight.result
+
+    def land(self, key, flight: Flight, result=None) -> None:
+        """Ends a flight, handing its result, if any, to those waiting for it."""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.result = result
+        flight.landed.set()
@@ -2,11 +2,17 @@
 
 # pylint: skip-file
 
+import json
+from threading import Event, Thread
+from time import sleep
 from unittest.mock import patch
-from datetime import datetime
+from datetime import datetime, date
 
 import pytest
 
+from date_functions import convert_to_datetime
+from msgpack_format import packb, unpackb
+
 
 class TestBetween:
     """Tests for the between route"""
@@ -80,6 +86,30 @@ class TestBetween:
         assert fake_between.called
         assert fake_between.call_count == 1
 
+    @patch("app.convert_to_datetime")
+    def test_caches_repeated_requests(self, fake_convert, test_app):
+        """Checks that an identical request is answered from the cache."""
+
+        fake_convert.side_effect = lambda x: datetime.strptime(x, "%d.%m.%Y")
+        data = {"first": "12.1.2000", "last": "14.1.2000"}
+
+        first = test_app.post("/between", json=data)
+        second = test_app.post("/between", json=data)
+
+        assert fake_convert.call_count == 2
+        assert second.json == first.json == {"days": 2}
+        assert second.headers["ETag"] == first.headers["ETag"]
+        # Shared caches don't keep POST responses, so none are offered
+        assert "Cache-Control" not in second.headers
+
+    def test_counts_days_in_zone(self, test_app):
+        """Checks that days are counted between dates in the given zone."""
+
+        data = {"first": "2023-10-09T23:30:00+00:00", "last": "2023-10-11T00:30:00+00:00"}
+
+        assert test_app.post("/between", json=data).json == {"days": 2}
+        assert test_app.post("/between", json={**data, "tz": "Asia/Tokyo"}).json == {"days": 1}
+
     @pytest.mark.parametrize("data, out", (({"first": "12.1.2000", "last": "14.1.2000"}, 2),
                                            ({"first": "1.1.2000",
                                             "last": "1.2.2000"}, 31),
@@ -107,6 +137,109 @@ class TestBetween:
         }
 
 
+class TestValidation:
+    """Tests for requests turned away before any parsing"""
+
+    @pytest.mark.parametrize("route", ("/between", "/weekday", "/business_days",
+                                       "/add_business_days", "/range", "/range/dates"))
+    @pytest.mark.parametrize("body, content_type", ((None, None), ("[1, 2]", "application/json"),
+                                                    ("{", "application/json"),
+                                                    ("first=1", "text/plain")))
+    def test_rejects_bodies_that_are_not_objects(self, route, body, content_type, test_app):
+        """Checks that missing, malformed or non-object bodies get a clean 400."""
+
+        result = test_app.post(route, data=body, content_type=content_type)
+
+        assert result.status_code == 400
+        assert result.json == {"error": "Missing required data."}
+
+    @pytest.mark.parametrize("value", ("9" * 10_000, [[0] * 100] * 100, {"day": 9}))
+    @patch("app.convert_to_datetime")
+    def test_rejects_dates_without_parsing(self, fake_convert, value, test_app):
+        """Checks that values that cannot be dates are never parsed."""
+
+        result = test_app.post("/between", json={"first": value, "last": "09.10.2023"})
+
+        assert result.status_code == 400
+        assert result.json == {"error": "Unable to convert value to datetime."}
+        assert fake_convert.call_count == 0
+
+    @patch("app.add_to_history")
+    def test_records_rejected_requests(self, fake_add, test_app):
+        """Checks that rejected requests are still recorded in the history."""
+
+        test_app.post("/weekday")
+
+        assert fake_add.call_count == 1
+
+    def test_rejects_non_ascii_history_number(self, test_app):
+        """Checks that digits other than 0-9 are rejected rather than failing."""
+
+        result = test_app.get("/history?number=²")
+
+        assert result.status_code == 400
+
+    def test_batch_items_are_validated(self, test_app):
+        """Checks that each batch item is checked against the route's schema."""
+
+        result = test_app.post("/between/batch", json=[
+            {"first": "12.1.2000", "last": "14.1.2000"}, {"first": ["x"], "last": "1.1.2000"}, 5])
+
+        assert result.json == [{"days": 2}, {"error": "Unable to convert value to datetime."},
+                               {"error": "Missing required data."}]
+
+
+class TestBetweenBatch:
+    """Tests for the between batch route"""
+
+    def test_returns_results_in_order(self, test_app):
+        """Checks that each item gets its own result, in order."""
+
+        result = test_app.post("/between/batch", json=[
+            {"first": "12.1.2000", "last": "14.1.2000"},
+            {"first": "12.1.2000"},
+            {"first": "red", "last": "14.1.2000"},
+            {"first": "1.2.2000", "last": "31.1.2000"}
+        ])
+
+        assert result.status_code == 200
+        assert result.json == [
+            {"days": 2},
+            {"error": "Missing required data."},
+            {"error": "Unable to convert value to datetime."},
+            {"days": -1}
+        ]
+
+    def test_accepts_newline_delimited_body(self, test_app):
+        """Checks that newline-delimited JSON is accepted."""
+
+        body = '{"first": "1.1.2000", "last": "1.2.2000"}\nnot json\n'
+        result = test_app.post("/between/batch", data=body,
+                               content_type="application/x-ndjson")
+
+        assert result.status_code == 200
+        assert result.json == [{"days": 31},
+                               {"error": "Missing required data."}]
+
+    @pytest.mark.parametrize("data", ([], {"first": "1.1.2000", "last": "1.2.2000"}))
+    def test_rejects_empty_batch(self, data, test_app):
+        """Checks that a batch without items is rejected."""
+
+        result = test_app.post("/between/batch", json=data)
+
+        assert result.status_code == 400
+        assert "error" in result.json
+
+    @patch("app.add_to_history")
+    def test_calls_add_to_history_once(self, fake_add, test_app):
+        """Checks that a batch is recorded as a single request."""
+
+        test_app.post("/between/batch", json=[
+            {"first": "12.1.2000", "last": "14.1.2000"}] * 10)
+
+        assert fake_add.call_count == 1
+
+
 class TestWeekday:
     """Tests for the weekday route"""
 
@@ -187,6 +320,39 @@ class TestWeekday:
             "weekday": out
         }
 
+    @pytest.mark.parametrize("data, out", (({"date": "2023-10-09"}, "Monday"),
+                                           ({"date": "Mon, 09 Oct 2023 23:30:00 +0000"}, "Monday"),
+                                           ({"date": "Mon, 09 Oct 2023 23:30:00 +0000",
+                                             "tz": "Europe/London"}, "Tuesday"),
+                                           ({"date": "2023-10-09T01:00:00+00:00",
+                                             "tz": "America/New_York"}, "Sunday"),
+                                           ({"date": "09.10.2023", "tz": "Asia/Tokyo"}, "Monday")))
+    def test_handles_other_formats_and_zones(self, data, out, test_app):
+        """Checks that dates in other formats are found in the given zone."""
+
+        result = test_app.post("/weekday", json=data)
+
+        assert result.status_code == 200
+        assert result.json == {"weekday": out}
+
+    @pytest.mark.parametrize("tz", ("Not/AZone", 5))
+    def test_rejects_unknown_zone(self, tz, test_app):
+        """Checks that the route rejects unknown time zones."""
+
+        result = test_app.post("/weekday", json={"date": "09.10.2023", "tz": tz})
+
+        assert result.status_code == 400
+        assert result.json == {"error": "Unknown time zone."}
+
+    def test_cached_answer_is_not_reused_for_zone_named_none(self, test_app):
+        """Checks that a missing zone and the zone name "None" are cached apart."""
+
+        test_app.post("/weekday", json={"date": "09.10.2023"})
+        result = test_app.post("/weekday", json={"date": "09.10.2023", "tz": "None"})
+
+        assert result.status_code == 400
+        assert result.json == {"error": "Unknown time zone."}
+
     @patch("app.add_to_history")
     def test_calls_add_to_history(self, fake_add, test_app):
         """Checks that the route calls the add_to_history function."""
@@ -199,6 +365,272 @@ class TestWeekday:
         assert fake_add.call_count == 1
 
 
+class TestWeekdayBatch:
+    """Tests for the weekday batch route"""
+
+    def test_returns_results_in_order(self, test_app):
+        """Checks that each item gets its own result, in order."""
+
+        result = test_app.post("/weekday/batch", json=[
+            {"date": "09.10.2023"},
+            {"dat": "09.10.2023"},
+            {"date": "24/5/1999"},
+            {"date": "15.10.2023"},
+            "09.10.2023"
+        ])
+
+        assert result.status_code == 200
+        assert result.json == [
+            {"weekday": "Monday"},
+            {"error": "Missing required data."},
+            {"error": "Unable to convert value to datetime."},
+            {"weekday": "Sunday"},
+            {"error": "Missing required data."}
+        ]
+
+    def test_history_tracks_batch(self, test_app):
+        """Checks that the batch route adds to the history"""
+
+        test_app.post("/weekday/batch", json=[{"date": "09.10.2023"}])
+
+        result = test_app.get("/history")
+
+        assert result.json[1]["route"] == "weekday_batch"
+
+
+class TestBusinessDays:
+    """Tests for the business days routes"""
+
+    @pytest.mark.parametrize("route, data", (("/business_days", {"first": "1.1.2000"}),
+                                             ("/add_business_days", {"date": "1.1.2000",
+                                                                     "days": 1})))
+    def test_errors_match_other_routes(self, route, data, test_app):
+        """Checks that an error gets the same body as from /between."""
+
+        bad = {"tz": "Nowhere/Special", "first": "1.1.2000", "last": "2.1.2000"}
+        expected = test_app.post("/between", json=bad)
+        result = test_app.post(route, json={**data, **bad})
+
+        assert result.status_code == expected.status_code == 400
+        assert result.get_data() == expected.get_data()
+
+    @pytest.mark.parametrize("data, out", (({"first": "24.12.2025", "last": "05.01.2026"}, 5),
+                                           ({"first": "24.12.2025", "last": "05.01.2026",
+                                             "calendar": "none"}, 8),
+                                           ({"first": "05.01.2026", "last": "24.12.2025"}, -5),
+                                           ({"first": "2026-04-02", "last": "2026-04-08"}, 2)))
+    def test_counts_working_days(self, data, out, test_app):
+        """Checks that working days are counted, excluding holidays."""
+
+        result = test_app.post("/business_days", json=data)
+
+        assert result.status_code == 200
+        assert result.json == {"business_days": out}
+
+    @pytest.mark.parametrize("data, error", (({"first": "24.12.2025"}, "Missing required data."),
+                                             ({"first": "red", "last": "05.01.2026"},
+                                              "Unable to convert value to datetime."),
+                                             ({"first": "24.12.2025", "last": "05.01.2026",
+                                               "calendar": "mars"}, "Unknown holiday calendar.")))
+    def test_rejects_bad_input(self, data, error, test_app):
+        """Checks that the route rejects invalid input."""
+
+        result = test_app.post("/business_days", json=data)
+
+        assert result.status_code == 400
+        assert result.json == {"error": error}
+
+    @pytest.mark.parametrize("route, data", (("/business_days", {"first": "24.12.2025",
+                                                                  "last": "05.01.2026"}),
+                                              ("/add_business_days", {"date": "24.12.2025",
+                                                                      "days": 1})))
+    @pytest.mark.parametrize("calendar", ("None", ["none"]))
+    def test_invalid_calendar_is_not_answered_from_cache(self, route, data, calendar, test_app):
+        """Checks that an invalid calendar is rejected after the default
+        calendar's answer is cached."""
+
+        assert test_app.post(route, json=data).status_code == 200
+        result = test_app.post(route, json={**data, "calendar": calendar})
+
+        assert result.status_code == 400
+        assert result.json == {"error": "Unknown holiday calendar."}
+
+    @patch("app.convert_to_datetime", side_effect=convert_to_datetime)
+    def test_other_routes_ignore_calendar(self, fake_convert, test_app):
+        """Checks that routes without calendars share cache entries whatever
+        calendar is sent."""
+
+        data = {"first": "24.12.2025", "last": "05.01.2026"}
+        test_app.post("/between", json=data)
+        test_app.post("/between", json={**data, "calendar": "none"})
+
+        assert fake_convert.call_count == 2
+
+    @pytest.mark.parametrize("data, out", (({"date": "24.12.2025", "days": 1}, "29.12.2025"),
+                                           ({"date": "29.12.2025", "days": -1}, "24.12.2025"),
+                                           ({"date": "27.12.2025", "days": 0}, "29.12.2025"),
+                                           ({"date": "24.12.2025", "days": 1, "calendar": "none"},
+                                            "25.12.2025")))
+    def test_adds_working_days(self, data, out, test_app):
+        """Checks that working days are added to a date."""
+
+        result = test_app.post("/add_business_days", json=data)
+
+        assert result.status_code == 200
+        assert result.json == {"date": out}
+
+    @pytest.mark.parametrize("days", ("5", 1.5, True, 100_001))
+    def test_rejects_invalid_days(self, days, test_app):
+        """Checks that the number of days must be a whole number in range."""
+
+        test_app.post("/add_business_days", json={"date": "24.12.2025", "days": 5})
+        result = test_app.post("/add_business_days", json={"date": "24.12.2025", "days": days})
+
+        assert result.status_code == 400
+        assert "Days must be an integer" in result.json["error"]
+
+    def test_rejects_out_of_range_result(self, test_app):
+        """Checks that results past the last supported date are rejected."""
+
+        result = test_app.post("/add_business_days", json={"date": "30.12.9999", "days": 5})
+
+        assert result.status_code == 400
+        assert result.json == {"error": "Date is out of range."}
+
+
+class TestRange:
+    """Tests for the range routes"""
+
+    @pytest.mark.parametrize("route", ("/range", "/range/dates"))
+    def test_errors_match_other_routes(self, route, test_app):
+        """Checks that an error gets the same body as from /between."""
+
+        bad = {"tz": "Nowhere/Special", "first": "1.1.2000", "last": "2.1.2000"}
+        expected = test_app.post("/between", json=bad)
+        result = test_app.post(route, json=bad)
+
+        assert result.status_code == expected.status_code == 400
+        assert result.get_data() == expected.get_data()
+
+    def test_summarises_range(self, test_app):
+        """Checks that the range route counts days of each kind."""
+
+        result = test_app.post("/range", json={"first": "09.10.2023", "last": "2023-11-02"})
+
+        assert result.status_code == 200
+        assert result.json == {"days": 24, "weekend_days": 6, "month_starts": 1,
+                               "month_ends": 1, "leap_days": 0,
+                               "weekdays": {"Monday": 4, "Tuesday": 4, "Wednesday": 4,
+                                            "Thursday": 3, "Friday": 3, "Saturday": 3,
+                                            "Sunday": 3}}
+
+    @pytest.mark.parametrize("route", ("/range", "/range/dates"))
+    @pytest.mark.parametrize("data, error", (({"first": "09.10.2023"}, "Missing required data."),
+                                             ({"first": "red", "last": "09.10.2023"},
+                                              "Unable to convert value to datetime."),
+                                             ({"first": "10.10.2023", "last": "09.10.2023"},
+                                              "Last date must not be before first date.")))
+    def test_rejects_bad_input(self, route, data, error, test_app):
+        """Checks that the range routes reject invalid input."""
+
+        result = test_app.post(route, json=data)
+
+        assert result.status_code == 400
+        assert result.json == {"error": error}
+
+    def test_streams_dates(self, test_app):
+        """Checks that each date in the range is streamed as a JSON line."""
+
+        result = test_app.post("/range/dates", json={"first": "09.10.2023", "last": "01.01.2025"})
+        lines = result.get_data(as_text=True).splitlines()
+
+        assert result.status_code == 200
+        assert result.mimetype == "application/x-ndjson"
+        assert len(lines) == 450
+        assert json.loads(lines[0]) == {"date": "09.10.2023", "weekday": "Monday"}
+        assert json.loads(lines[-1]) == {"date": "31.12.2024", "weekday": "Tuesday"}
+
+    def test_streams_one_weekday(self, test_app):
+        """Checks that only dates on the given weekday are streamed."""
+
+        result = test_app.post("/range/dates", json={"first": "09.10.2023", "last": "31.10.2023",
+                                                     "weekday": "Friday"})
+
+        assert [json.loads(line)["date"] for line in result.get_data(as_text=True).splitlines()] \
+            == ["13.10.2023", "20.10.2023", "27.10.2023"]
+
+
+class TestBulk:
+    """Tests for the bulk route"""
+
+    def test_streams_ndjson_results(self, test_app):
+        """Checks that each NDJSON row gets a result line, in order."""
+
+        body = ('{"date": "09.10.2023"}\n'
+                '{"first": "1.1.2000", "last": "1.2.2000"}\n'
+                'not json\n'
+                '\n'
+                '{"date": "red"}\n')
+        result = test_app.post("/bulk", data=body, content_type="application/x-ndjson")
+
+        assert result.status_code == 200
+        assert result.mimetype == "application/x-ndjson"
+        assert [json.loads(x) for x in result.get_data(as_text=True).splitlines()] == [
+            {"weekday": "Monday"},
+            {"days": 31},
+            {"error": "Invalid JSON.", "line": 3},
+            {"error": "Unable to convert value to datetime.", "line": 5}
+        ]
+
+    def test_streams_csv_results(self, test_app):
+        """Checks that each CSV row gets a result row, in order."""
+
+        body = "date\n09.10.2023\n24/5/1999\n1.1.2000,1.2.2000\n"
+        result = test_app.post("/bulk", data=body, content_type="text/csv")
+
+        assert result.status_code == 200
+        assert result.get_data(as_text=True).splitlines() == [
+            "date,result,error",
+            "09.10.2023,Monday,",
+            "24/5/1999,,Unable to convert value to datetime.",
+            "1.1.2000,1.2.2000,31,"
+        ]
+
+    def test_reports_long_ndjson_lines_once(self, test_app):
+        """Checks that a line over the maximum length gets one error and
+        the lines after it keep their numbers."""
+
+        body = ('{"date": "' + "9" * 70_000 + '"}\n'
+                '{"date": "09.10.2023"}\n'
+                '{"date": "red"}\n')
+        result = test_app.post("/bulk", data=body, content_type="application/x-ndjson")
+
+        assert [json.loads(x) for x in result.get_data(as_text=True).splitlines()] == [
+            {"error": "Line too long.", "line": 1},
+            {"weekday": "Monday"},
+            {"error": "Unable to convert value to datetime.", "line": 3}
+        ]
+
+    def test_reports_long_csv_lines_once(self, test_app):
+        """Checks that a CSV line over the maximum length gets one error row."""
+
+        body = "date\n" + "9" * 140_000 + "\n\n09.10.2023\n"
+        result = test_app.post("/bulk", data=body, content_type="text/csv")
+
+        assert result.get_data(as_text=True).splitlines() == [
+            "date,result,error",
+            ",Line too long.",
+            "09.10.2023,Monday,"
+        ]
+
+    def test_rejects_other_content_types(self, test_app):
+        """Checks that only NDJSON and CSV uploads are accepted."""
+
+        result = test_app.post("/bulk", json=[{"date": "09.10.2023"}])
+
+        assert result.status_code == 415
+
+
 class TestHistory:
     """Tests for the history route"""
 
@@ -345,6 +777,157 @@ class TestHistory:
         assert len(data) == 3
         assert all(x["route"] == "history" for x in data)
 
+    def test_filters_by_route_and_method(self, test_app):
+        """Checks that route and method filters return only matching requests."""
+
+        for _ in range(3):
+            test_app.post("/weekday", json={"date": "09.10.2023"})
+        test_app.post("/between", json={"first": "12.1.2000", "last": "14.1.2000"})
+
+        result = test_app.get("/history?route=weekday&method=post&number=20")
+
+        assert result.status_code == 200
+        assert [(x["method"], x["route"]) for x in result.json] == [("POST", "weekday")] * 3
+        assert test_app.get("/history?method=DELETE").json == []
+
+    def test_filters_by_time(self, test_app):
+        """Checks that since and until limit the requests returned."""
+
+        from app import app_history
+
+        app_history.append("GET", "index", 1_000_000)
+        app_history.append("GET", "index", 2_000_000)
+
+        result = test_app.get("/history?route=index&since=1970-01-12T00:00:00%2B00:00&until=2000000")
+
+        assert len(result.json) == 1
+
+    def test_pages_with_link_header(self, test_app):
+        """Checks that large results are paged with a cursor in a Link header."""
+
+        for _ in range(5):
+            test_app.post("/weekday", json={"date": "09.10.2023"})
+
+        first = test_app.get("/history?route=weekday&number=3")
+        link = first.headers["Link"]
+        second = test_app.get(link[1:link.index(">")])
+
+        assert link.endswith('; rel="next"') and "cursor=" in link
+        assert len(first.json) == 3 and len(second.json) == 2
+        assert "Link" not in second.headers
+
+    def test_aggregates_counts(self, test_app):
+        """Checks that aggregate returns counts per route and method."""
+
+        for _ in range(2):
+            test_app.post("/weekday", json={"date": "09.10.2023"})
+
+        result = test_app.get("/history?aggregate=hour&route=weekday")
+
+        assert [(x["method"], x["route"], x["count"]) for x in result.json] == [
+            ("POST", "weekday", 2)]
+
+    @pytest.mark.parametrize("query, error", (
+        ("since=yesterday", "Since and until must be ISO 8601 times or epoch seconds."),
+        ("until=2023-13-01", "Since and until must be ISO 8601 times or epoch seconds."),
+        ("method=GET1", "Method must be an HTTP method, such as POST."),
+        ("cursor=-1", "Cursor must be one given by a previous page."),
+        ("aggregate=day", "Aggregate must be one of minute, hour.")))
+    def test_rejects_invalid_filters(self, query, error, test_app):
+        """Checks that invalid query parameters are rejected."""
+
+        result = test_app.get(f"/history?{query}")
+
+        assert result.status_code == 400
+        assert result.json == {"error": error}
+
+
+class TestMetrics:
+    """Tests for the metrics route"""
+
+    def test_reports_requests(self, test_app):
+        """Checks that earlier requests appear in the metrics."""
+
+        test_app.post("/weekday", json={"date": "red"})
+
+        result = test_app.get("/metrics")
+
+        assert result.status_code == 200
+        assert result.mimetype == "text/plain"
+        assert 'days_api_requests_total{route="weekday",status="400"}' in result.get_data(as_text=True)
+
+    def test_sends_one_charset(self, test_app):
+        """Checks that the content type is sent as it is, without a second charset."""
+
+        result = test_app.get("/metrics")
+
+        assert result.headers["Content-Type"] == "text/plain; version=0.0.4; charset=utf-8"
+
+    def test_does_not_add_to_history(self, test_app):
+        """Checks that scraping metrics is not recorded in the history."""
+
+        test_app.get("/metrics")
+
+        result = test_app.get("/history")
+
+        assert len(result.json) == 1
+
+
+class TestSingleFlight:
+    """Tests for sharing answers between identical concurrent requests"""
+
+    @pytest.mark.parametrize("config", ({}, {"RESPONSE_CACHE_SIZE": "0"}))
+    @patch("app.get_days_between")
+    def test_concurrent_requests_share_one_computation(self, fake_between, config):
+        """Checks that identical requests in flight together compute once."""
+
+        from app import create_app
+
+        started = Event()
+
+        def slow_between(first, last):
+            started.set()
+            sleep(0.2)
+            return 2
+
+        fake_between.side_effect = slow_between
+        app = create_app(config)
+        results = []
+
+        def send():
+            results.append(app.test_client().post("/between", json={
+                "first": "12.1.2000", "last": "14.1.2000"}).json)
+
+        leader = Thread(target=send)
+        leader.start()
+        started.wait()
+        followers = [Thread(target=send) for _ in range(4)]
+        for thread in followers:
+            thread.start()
+        for thread in [leader, *followers]:
+            thread.join()
+
+        assert results == [{"days": 2}] * 5
+        assert fake_between.call_count == 1
+        metrics = app.test_client().get("/metrics").get_data(as_text=True)
+        assert "days_api_coalesced_requests_total 4" in metrics
+
+    def test_failed_requests_release_waiters(self):
+        """Checks that a request that fails does not hold up later ones."""
+
+        from app import create_app
+
+        app = create_app({})
+        client = app.test_client()
+
+        with patch("app.get_days_between", side_effect=RuntimeError):
+            assert client.post("/between", json={"first": "12.1.2000",
+                                                 "last": "14.1.2000"}).status_code == 500
+
+        assert len(app.extensions["single_flight"]) == 0
+        assert client.post("/between", json={"first": "12.1.2000",
+                                              "last": "14.1.2000"}).json == {"days": 2}
+
 
 class TestCurrentAge:
     """Tests for the current_age route"""
@@ -390,3 +973,159 @@ class TestCurrentAge:
         assert result.status_code == 200
         assert "current_age" in result.json
         assert result.json["current_age"] == 0
+
+    def test_returns_age(self, test_app):
+        """Checks that the age is worked out from the birthdate."""
+
+        today = date.today()
+        result = test_app.get(f"/current_age?date={today.year - 30}-01-01")
+
+        assert result.status_code == 200
+        assert result.json == {"current_age": 30}
+
+    def test_accepts_other_formats_and_zones(self, test_app):
+        """Checks that birthdates in other formats and a time zone are accepted."""
+
+        year = date.today().year - 30
+        result = test_app.get(f"/current_age?date=01.01.{year}&tz=Europe/London")
+
+        assert result.status_code == 200
+        assert result.json == {"current_age": 30}
+        assert test_app.get(f"/current_age?date=01.01.{year}&tz=Nowhere").status_code == 400
+
+    @patch("app.get_current_age")
+    def test_conditional_request_is_not_modified(self, fake_get_current_age, test_app):
+        """Checks that a request with a matching ETag gets a 304."""
+
+        fake_get_current_age.return_value = 0
+
+        result = test_app.get("/current_age?date=2000-01-01")
+        repeat = test_app.get("/current_age?date=2000-01-01",
+                              headers={"If-None-Match": result.headers["ETag"]})
+
+        assert repeat.status_code == 304
+        assert fake_get_current_age.call_count == 1
+
+
+class TestMsgpack:
+    """Tests for MessagePack requests and responses"""
+
+    def test_accepts_and_returns_msgpack(self, test_app):
+        """Checks that MessagePack bodies are read and sent when asked for."""
+
+        result = test_app.post("/between", data=packb({"first": "12.1.2000", "last": "14.1.2000"}),
+                               content_type="application/msgpack",
+                               headers={"Accept": "application/msgpack"})
+
+        assert result.status_code == 200
+        assert result.mimetype == "application/msgpack"
+        assert unpackb(result.get_data()) == {"days": 2}
+        assert "Accept" in result.headers["Vary"]
+
+    def test_json_and_msgpack_are_cached_apart(self, test_app):
+        """Checks that each format gets its own cached body and ETag."""
+
+        data = {"date": "09.10.2023"}
+        packed = test_app.post("/weekday", json=data, headers={"Accept": "application/msgpack"})
+        plain = test_app.post("/weekday", json=data)
+
+        assert unpackb(packed.get_data()) == plain.json == {"weekday": "Monday"}
+        assert packed.headers["ETag"] != plain.headers["ETag"]
+
+    def test_accepts_timestamps_as_dates(self, test_app):
+        """Checks that MessagePack timestamps can be given as dates."""
+
+        result = test_app.post("/weekday/batch", data=packb([{"date": date(2023, 10, 9)},
+                                                            {"date": "red"}, {}]),
+                               content_type="application/msgpack",
+                               headers={"Accept": "application/msgpack"})
+
+        assert unpackb(result.get_data()) == [{"weekday": "Monday"},
+                                              {"error": "Unable to convert value to datetime."},
+                                              {"error": "Missing required data."}]
+
+    @pytest.mark.parametrize("route, data, error", (("/between", {"first": "12.1.2000"},
+                                                     "Missing required data."),
+                                                    ("/weekday", {"date": "red"},
+                                                     "Unable to convert value to datetime."),
+                                                    ("/history?number=50", None,
+                                                     "Number must be an integer between 1 and 20.")))
+    def test_errors_are_the_same(self, route, data, error, test_app):
+        """Checks that errors carry the same status and message in both formats."""
+
+        send = test_app.get if data is None else test_app.post
+        kwargs = {} if data is None else {"data": packb(data),
+                                          "content_type": "application/msgpack"}
+        result = send(route, headers={"Accept": "application/msgpack"}, **kwargs)
+
+        assert result.status_code == 400
+        assert unpackb(result.get_data()) == {"error": error}
+
+    def test_rejects_invalid_msgpack(self, test_app):
+        """Checks that a malformed MessagePack body is rejected."""
+
+        result = test_app.post("/between", data=b"\xc1", content_type="application/msgpack")
+
+        assert result.status_code == 400
+
+    def test_json_stays_the_default(self, test_app):
+        """Checks that clients that accept anything get JSON."""
+
+        result = test_app.get("/", headers={"Accept": "*/*"})
+
+        assert result.mimetype == "application/json"
+
+
+class TestCreateApp:
+    """Tests for the app factory"""
+
+    def test_uses_given_history_store(self):
+        """Checks that an injected history store records requests."""
+
+        from app import create_app
+        from history import HistoryStore
+
+        store = HistoryStore(10)
+        client = create_app({}, store).test_client()
+
+        client.post("/weekday", json={"date": "09.10.2023"})
+
+        assert [entry["route"] for entry in store.latest(5)] == ["weekday"]
+
+    def test_apps_are_independent(self, test_app):
+        """Checks that a new app does not share the default app's state."""
+
+        from app import create_app
+
+        client = create_app({}).test_client()
+        client.get("/history")
+        client.get("/history")
+
+        assert len(client.get("/history").json) == 3
+        assert len(test_app.get("/history").json) == 1
+
+    def test_enables_subsystems_from_config(self):
+        """Checks that optional subsystems are set up from the config."""
+
+        from app import create_app
+
+        client = create_app({"RATE_LIMITS": "index=1/60"}).test_client()
+
+        assert client.get("/").status_code == 200
+        assert client.get("/").status_code == 429
+
+    def test_date_formats_are_kept_per_app(self, test_app):
+        """Checks that an app's date formats do not change other apps'."""
+
+        from app import create_app
+
+        client = create_app({"DATE_FORMATS": "iso"}).test_client()
+        body = {"first": "09.10.2023", "last": "10.10.2023"}
+
+        assert test_app.post("/between", json=body).json == {"days": 1}
+        assert client.post("/between", json=body).status_code == 400
+        assert client.post("/between", json={"first": "2023-10-09",
+                                             "last": "2023-10-10"}).json == {"days": 1}
+        assert test_app.post("/weekday", json={"date": "10.10.2023"}).json == {
+            "weekday": "Tuesday"}
+        assert convert_to_datetime("11.10.2023") == datetime(2023, 10, 11)
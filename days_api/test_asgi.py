@@ -0,0 +1,92 @@
+"""Tests for the ASGI entry point"""
+
+# pylint: skip-file
+
+import asyncio
+import json
+
+import pytest
+
+import asgi
+from asgi import BodyStream, application, build_environ, pump_body
+
+
+def scope(path="/between", method="POST"):
+    return {"type": "http", "method": method, "path": path, "query_string": b"",
+            "headers": [(b"content-type", b"application/json")]}
+
+
+def test_path_is_not_decoded_twice():
+    """Checks that an already decoded path is passed on as it is."""
+
+    async def build():
+        return build_environ(scope("/100%25/é"), BodyStream(asyncio.get_running_loop()))
+
+    environ = asyncio.run(build())
+
+    assert environ["PATH_INFO"].encode("latin-1").decode("utf-8") == "/100%25/é"
+
+
+def test_request_body_is_bounded():
+    """Checks that no more body chunks are queued than the limit, and that
+    reading one makes room for the next."""
+
+    received = []
+
+    async def receive():
+        received.append(b"x")
+        return {"type": "http.request", "body": b"x", "more_body": True}
+
+    async def run():
+        body = BodyStream(asyncio.get_running_loop(), limit=2)
+        pump = asyncio.create_task(pump_body(receive, body))
+        await asyncio.sleep(0.05)
+        queued = body.chunks.qsize()
+        await asyncio.to_thread(body.read, 1)
+        await asyncio.sleep(0.05)
+        pump.cancel()
+        return queued, body.chunks.qsize()
+
+    assert asyncio.run(run()) == (2, 2)
+    # One chunk read, two queued and one waiting for room
+    assert len(received) == 4
+
+
+def test_body_sent_in_many_chunks():
+    """Checks that a body sent in more chunks than can be queued arrives whole."""
+
+    data = json.dumps({"first": "1.1.2000", "last": "7.1.2000"}).encode()
+    requests = [{"type": "http.request", "body": data[i:i + 1], "more_body": i + 1 < len(data)}
+                for i in range(len(data))]
+    sent = []
+
+    async def receive():
+        return requests.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(application(scope(), receive, send))
+
+    assert sent[0]["status"] == 200
+    assert json.loads(b"".join(x.get("body", b"") for x in sent[1:])) == {"days": 6}
+
+
+def test_worker_finishes_when_sending_fails(monkeypatch):
+    """Checks that a worker waiting for room in a full response queue is
+    not left waiting when the client has gone."""
+
+    monkeypatch.setattr(asgi, "QUEUED_CHUNKS", 1)
+    data = json.dumps({"first": "1.1.2000", "last": "7.1.2000"}).encode()
+
+    async def receive():
+        return {"type": "http.request", "body": data, "more_body": False}
+
+    async def send(message):
+        raise OSError("Connection reset")
+
+    async def run():
+        await asyncio.wait_for(application(scope(), receive, send), 5)
+
+    with pytest.raises(OSError):
+        asyncio.run(run())
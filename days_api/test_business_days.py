@@ -0,0 +1,122 @@
+"""Tests for working day calculations."""
+
+# pylint: skip-file
+
+from datetime import date, timedelta
+
+import pytest
+
+from business_days import Calendars, HolidayCalendar, load_calendar, weekdays_before
+
+CHRISTMAS_2025 = [date(2025, 12, 25), date(2025, 12, 26), date(2026, 1, 1)]
+
+
+def brute_count(calendar, first, last):
+    """Counts working days one day at a time."""
+    if last < first:
+        return -brute_count(calendar, last, first)
+    days = (first + timedelta(n) for n in range((last - first).days))
+    return sum(day.weekday() < 5 and day.toordinal() not in calendar.holidays for day in days)
+
+
+@pytest.mark.parametrize("ordinal", range(1, 30))
+def test_weekdays_before(ordinal):
+    """Checks that weekdays are counted in closed form."""
+
+    days = (date.fromordinal(n) for n in range(1, ordinal))
+    assert weekdays_before(ordinal) == sum(day.weekday() < 5 for day in days)
+
+
+@pytest.mark.parametrize("first, last, out", ((date(2025, 12, 22), date(2025, 12, 29), 3),
+                                              (date(2025, 12, 29), date(2025, 12, 22), -3),
+                                              (date(2025, 12, 20), date(2025, 12, 21), 0),
+                                              (date(2025, 12, 24), date(2025, 12, 24), 0),
+                                              (date(2025, 12, 24), date(2026, 1, 5), 5)))
+def test_count(first, last, out):
+    """Checks that working days are counted between dates."""
+
+    assert HolidayCalendar(CHRISTMAS_2025).count(first, last) == out
+
+
+def test_count_matches_brute_force():
+    """Checks counting against counting one day at a time."""
+
+    calendar = HolidayCalendar(CHRISTMAS_2025)
+    start = date(2025, 12, 1)
+    for first in range(0, 60, 3):
+        for last in range(0, 60, 5):
+            assert calendar.count(start + timedelta(first), start + timedelta(last)) == \
+                brute_count(calendar, start + timedelta(first), start + timedelta(last))
+
+
+@pytest.mark.parametrize("start, days, out", ((date(2025, 12, 24), 1, date(2025, 12, 29)),
+                                              (date(2025, 12, 24), 3, date(2025, 12, 31)),
+                                              (date(2025, 12, 24), 4, date(2026, 1, 2)),
+                                              (date(2025, 12, 29), -1, date(2025, 12, 24)),
+                                              (date(2025, 12, 27), 0, date(2025, 12, 29)),
+                                              (date(2025, 12, 24), 0, date(2025, 12, 24)),
+                                              (date(2025, 12, 27), -1, date(2025, 12, 24)),
+                                              (date(2025, 12, 1), 5, date(2025, 12, 8))))
+def test_add(start, days, out):
+    """Checks that working days are added to dates."""
+
+    assert HolidayCalendar(CHRISTMAS_2025).add(start, days) == out
+
+
+def test_add_inverts_count():
+    """Checks that adding working days agrees with counting them."""
+
+    calendar = HolidayCalendar(CHRISTMAS_2025)
+    start = date(2025, 12, 19)
+    for days in range(1, 40):
+        result = calendar.add(start, days)
+        assert calendar.is_working_day(result)
+        assert calendar.count(start + timedelta(1), result + timedelta(1)) == days
+        assert calendar.add(result, -days) == start
+
+
+@pytest.mark.parametrize("start, days", ((date.max, 1), (date.min, -1)))
+def test_add_rejects_out_of_range(start, days):
+    """Checks that results outside the supported dates are rejected."""
+
+    with pytest.raises(ValueError):
+        HolidayCalendar().add(start, days)
+
+
+def test_holidays_at_weekends_are_ignored():
+    """Checks that holidays falling at weekends do not change counts."""
+
+    calendar = HolidayCalendar([date(2026, 12, 26)])
+
+    assert list(calendar.holidays) == []
+
+
+def test_load_calendar(tmp_path):
+    """Checks that calendars are read from files."""
+
+    file = tmp_path / "test.txt"
+    file.write_text("# Holidays\n2025-12-25 Christmas Day\n\n2025-12-26\n")
+
+    assert list(load_calendar(str(file)).holidays) == [date(2025, 12, 25).toordinal(),
+                                                      date(2025, 12, 26).toordinal()]
+
+
+def test_calendars_load_bundled_files():
+    """Checks that the bundled calendars are found by name."""
+
+    calendars = Calendars()
+    calendar = calendars.get("england-and-wales")
+
+    assert calendars.get("england-and-wales") is calendar
+    assert not calendar.is_working_day(date(2026, 12, 28))
+    assert calendars.get("none").is_working_day(date(2026, 12, 28))
+
+
+@pytest.mark.parametrize("name", ("missing", "../holidays/england-and-wales", "", 5, ["none"]))
+def test_calendars_reject_unknown_names(name):
+    """Checks that unknown calendar names are rejected."""
+
+    with pytest.raises(ValueError) as err:
+        Calendars().get(name)
+
+    assert err.value.args[0] == "Unknown holiday calendar."
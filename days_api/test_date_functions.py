@@ -2,11 +2,17 @@
 
 # pylint: skip-file
 
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, timedelta, timezone
+from itertools import permutations
+from threading import Thread
+from zoneinfo import ZoneInfo
 
 import pytest
 
-from date_functions import convert_to_datetime, get_days_between, get_day_of_week_on, get_current_age
+from date_functions import convert_to_datetime, convert_all_to_datetime, get_days_between, get_day_of_week_on, get_current_age
+from date_functions import ParseCache, parse_date, convert_to_date, Today, next_midnight, parse_instant
+from date_functions import get_weekday_counts, get_range_summary, iter_dates, WEEKDAY_NAMES
+from date_functions import DateParser, DEFAULT_FORMATS, REORDER_EVERY, get_zone, in_zone, set_date_formats
 
 
 @pytest.mark.parametrize("inp, out", (("12.01.1999", (12, 1, 1999)),
@@ -32,6 +38,67 @@ def test_convert_to_datetime_rejects_bad_input(inp):
     assert err.value.args[0] == "Unable to convert value to datetime."
 
 
+@pytest.mark.parametrize("inp", ("12.1.2000", " 1.1.2000", "28.02.0100", "09.10.2023"))
+def test_parse_date_matches_strptime(inp):
+    """Checks that the fast parser agrees with strptime."""
+
+    assert parse_date(inp) == datetime.strptime(inp, "%d.%m.%Y")
+
+
+@pytest.mark.parametrize("inp", ("24.5.19", "31.02.2013", "1.1.2000 ", "00.01.2000", "1.1.20000"))
+def test_parse_date_rejects_what_strptime_rejects(inp):
+    """Checks that the fast parser rejects the same input as strptime."""
+
+    with pytest.raises(ValueError):
+        parse_date(inp)
+
+
+def test_parse_cache_counts_hits_misses_and_evictions():
+    """Checks that the cache is bounded and keeps its counters."""
+
+    cache = ParseCache(2)
+    cache.put("a", datetime(2000, 1, 1))
+    cache.put("b", datetime(2000, 1, 2))
+    cache.get("a")
+    cache.put("c", datetime(2000, 1, 3))
+
+    assert cache.get("b") is None
+    assert cache.get("a") == datetime(2000, 1, 1)
+    assert cache.info() == {"hits": 2, "misses": 1, "evictions": 1,
+                            "size": 2, "maxsize": 2}
+
+
+def test_parse_cache_counts_every_lookup_across_threads():
+    """Checks that no lookup or eviction is lost when threads share the cache."""
+
+    cache = ParseCache(8)
+    lookups = 2000
+
+    def work(thread):
+        for number in range(lookups):
+            key = str((thread * 7 + number) % 16)
+            if cache.get(key) is None:
+                cache.put(key, datetime(2000, 1, 1))
+
+    threads = [Thread(target=work, args=(x,)) for x in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    info = cache.info()
+
+    assert info["hits"] + info["misses"] == 8 * lookups
+    assert info["size"] == 8
+    assert info["evictions"] <= info["misses"] - 8
+
+def test_convert_all_to_datetime():
+    """Checks that invalid values are replaced with None."""
+
+    result = convert_all_to_datetime(["12.01.1999", "red", "12.01.1999", 4])
+
+    assert result == [datetime(1999, 1, 12), None, datetime(1999, 1, 12), None]
+
+
 @pytest.mark.parametrize("first, last, out", ((datetime(2023, 1, 1), datetime(2024, 1, 1), 365),
                                               (datetime(2023, 1, 1), datetime(2023, 1, 2), 1),
                                               (datetime(2023, 1, 1), datetime(2023, 2, 1), 31),
@@ -87,6 +154,40 @@ def test_get_day_of_week_on_invalid(inp):
     assert err.value.args[0] == "Datetime required."
 
 
+@pytest.mark.parametrize("inp, out", (("2000-01-12", date(2000, 1, 12)),
+                                      ("0001-01-01", date(1, 1, 1)),
+                                      ("2024-02-29", date(2024, 2, 29))))
+def test_convert_to_date(inp, out):
+    """Checks that the function handles valid input."""
+
+    assert convert_to_date(inp) == out
+
+
+@pytest.mark.parametrize("inp", ("2023-02-29", "19-02-02", "2000-1-12", "23/01/2000", 0, None))
+def test_convert_to_date_rejects_bad_input(inp):
+    """Checks that the function handles invalid input."""
+
+    with pytest.raises(ValueError) as err:
+        convert_to_date(inp)
+
+    assert err.value.args[0] == "Unable to convert value to date."
+
+
+@pytest.mark.parametrize("birthdate, out", ((date(2000, 3, 1), 23),
+                                            (date(2000, 3, 2), 22),
+                                            (date(2000, 2, 29), 23),
+                                            (date(2023, 3, 1), 0)))
+def test_age_uses_calendar_birthdays(birthdate, out):
+    """Checks that ages change exactly on birthdays."""
+
+    today = Today()
+    today._date = date(2023, 3, 1)
+    today._until = next_midnight()
+
+    assert today.age(birthdate) == out
+    assert today.ages[birthdate] == out
+
+
 @pytest.mark.parametrize("inp", (None,
                                  "a real date",
                                  33,
@@ -135,4 +236,186 @@ def test_get_current_age_birthday_passed(year):
     result = get_current_age(birthdate)
 
     assert isinstance(result, int)
-    assert result == expected_age
\ No newline at end of file
+    assert result == expected_age
+
+@pytest.mark.parametrize("inp, out", (("2023-10-09", datetime(2023, 10, 9)),
+                                      ("2023-10-09T23:30:00", datetime(2023, 10, 9)),
+                                      ("2023-10-09T23:30:00+01:00",
+                                       datetime(2023, 10, 9, 23, 30, tzinfo=timezone(timedelta(hours=1)))),
+                                      ("Mon, 09 Oct 2023 12:00:00 +0000",
+                                       datetime(2023, 10, 9, 12, tzinfo=timezone.utc)),
+                                      ("9 Oct 2023 12:00 -0000", datetime(2023, 10, 9))))
+def test_parse_date_other_formats(inp, out):
+    """Checks that ISO 8601 and RFC 2822 dates are parsed."""
+
+    assert parse_date(inp) == out
+
+
+@pytest.mark.parametrize("inp", ("1", "33.0", "True", "1880.12.01", "24/5/1999", "red",
+                                 "2023-02-30", "20231009", "Mon, 32 Oct 2023 10:00"))
+def test_parse_date_rejects_unknown_formats(inp):
+    """Checks that strings in no recognised format are rejected."""
+
+    with pytest.raises(ValueError):
+        parse_date(inp)
+
+
+def test_epoch_times_are_opt_in():
+    """Checks that epoch times are only parsed when enabled."""
+
+    parser = DateParser(("dmy", "epoch"))
+
+    assert parser.parse("1696852800") == datetime(2023, 10, 9, 12, tzinfo=timezone.utc)
+    with pytest.raises(ValueError):
+        DateParser().parse("1696852800")
+
+
+def test_rejects_unknown_format_names():
+    """Checks that unknown format names are rejected."""
+
+    with pytest.raises(ValueError):
+        DateParser(("dmy", "julian"))
+
+
+@pytest.mark.parametrize("inp", ("12.5", "09.10.2023", " 9.10.2023", "2023-10-09",
+                                 "Mon, 09 Oct 2023 12:00:00 +0000", "1696852800", "-12",
+                                 "12.", "12.5.", "2023-10-09T12:00:00+01:00", "red"))
+def test_format_order_never_changes_a_result(inp):
+    """Checks that every order of the formats gives the same result."""
+
+    results = set()
+    for formats in permutations(("dmy", "iso", "rfc2822", "epoch")):
+        try:
+            results.add(DateParser(formats).parse(inp))
+        except ValueError:
+            results.add(ValueError)
+
+    assert len(results) == 1
+
+
+def test_parser_tries_commonest_format_first():
+    """Checks that the formats are reordered by how often they match."""
+
+    parser = DateParser()
+    for _ in range(REORDER_EVERY):
+        parser.parse("2023-10-09")
+
+    assert parser.formats()[0] == "iso"
+    assert parser.parse("09.10.2023") == datetime(2023, 10, 9)
+
+
+def test_set_date_formats_clears_parsed_dates():
+    """Checks that changing the formats forgets dates parsed with the old ones."""
+
+    try:
+        convert_to_datetime("09.10.2023")
+        set_date_formats(("iso",))
+        with pytest.raises(ValueError):
+            convert_to_datetime("09.10.2023")
+    finally:
+        set_date_formats(DEFAULT_FORMATS)
+
+
+@pytest.mark.parametrize("inp, zone, out", ((datetime(2023, 10, 9, 23, 30, tzinfo=timezone.utc), None,
+                                             datetime(2023, 10, 9)),
+                                            (datetime(2023, 10, 9, 23, 30, tzinfo=timezone.utc),
+                                             ZoneInfo("Europe/London"), datetime(2023, 10, 10)),
+                                            (datetime(2023, 10, 9, 2, tzinfo=timezone.utc),
+                                             ZoneInfo("America/New_York"), datetime(2023, 10, 8)),
+                                            (datetime(2023, 10, 9), ZoneInfo("Asia/Tokyo"),
+                                             datetime(2023, 10, 9))))
+def test_in_zone(inp, zone, out):
+    """Checks that datetimes are moved to the start of their day in a zone."""
+
+    assert in_zone(inp, zone) == out
+
+
+def test_get_zone():
+    """Checks that time zones are found by name."""
+
+    assert get_zone("Europe/London") == ZoneInfo("Europe/London")
+    assert get_zone(None) is None
+    for name in ("Not/AZone", "../etc", 5):
+        with pytest.raises(ValueError):
+            get_zone(name)
+
+
+def test_next_midnight_in_zone():
+    """Checks that the next midnight in a zone is worked out in that zone."""
+
+    zone = ZoneInfo("Pacific/Kiritimati")
+    midnight = datetime.fromtimestamp(next_midnight(zone), zone)
+
+    assert midnight.time() == datetime.min.time()
+    assert midnight.date() == datetime.now(zone).date() + timedelta(days=1)
+
+
+@pytest.mark.parametrize("value, out", (("1696870800", 1696870800), ("-60", -60),
+                                        ("2023-10-09T17:00:00+00:00", 1696870800),
+                                        ("2023-10-09T18:00:00+01:00", 1696870800),
+                                        ("2023-10-09T17:00:00Z", 1696870800)))
+def test_parse_instant(value, out):
+    """Checks that epoch seconds and ISO 8601 times give epoch seconds."""
+
+    assert parse_instant(value) == out
+
+
+def test_parse_instant_takes_naive_times_as_local():
+    """Checks that times without a zone are local, like the history's."""
+
+    assert parse_instant("2023-10-09T17:00") == int(datetime(2023, 10, 9, 17).timestamp())
+
+
+def brute_summary(first, last):
+    """Counts days of each kind one day at a time."""
+    days = [first.date() + timedelta(n) for n in range((last - first).days)]
+    return {"days": len(days),
+            "weekdays": {name: sum(day.weekday() == index for day in days)
+                         for index, name in enumerate(WEEKDAY_NAMES)},
+            "weekend_days": sum(day.weekday() > 4 for day in days),
+            "month_starts": sum(day.day == 1 for day in days),
+            "month_ends": sum((day + timedelta(1)).day == 1 for day in days),
+            "leap_days": sum((day.month, day.day) == (2, 29) for day in days)}
+
+
+@pytest.mark.parametrize("first, last", ((datetime(2023, 10, 9), datetime(2023, 10, 9)),
+                                         (datetime(2023, 10, 9), datetime(2023, 10, 16)),
+                                         (datetime(2024, 1, 31), datetime(2024, 3, 1)),
+                                         (datetime(2024, 2, 29), datetime(2024, 3, 1)),
+                                         (datetime(1899, 12, 31), datetime(2101, 1, 1)),
+                                         (datetime(2023, 10, 11), datetime(2023, 11, 2))))
+def test_get_range_summary(first, last):
+    """Checks that range counts match counting one day at a time."""
+
+    assert get_range_summary(first, last) == brute_summary(first, last)
+
+
+def test_get_weekday_counts():
+    """Checks that the days of the week are counted over a range."""
+
+    counts = get_weekday_counts(datetime(2023, 10, 9), datetime(2023, 10, 18))
+
+    assert counts["Monday"] == counts["Tuesday"] == 2
+    assert counts["Wednesday"] == counts["Sunday"] == 1
+
+
+def test_range_functions_reject_reversed_ranges():
+    """Checks that a last date before the first is rejected."""
+
+    with pytest.raises(ValueError):
+        get_range_summary(datetime(2023, 10, 9), datetime(2023, 10, 8))
+    with pytest.raises(ValueError):
+        iter_dates(datetime(2023, 10, 9), datetime(2023, 10, 8))
+
+
+def test_iter_dates():
+    """Checks that each date in a range is produced, or each on one weekday."""
+
+    first, last = datetime(2023, 10, 10), datetime(2023, 10, 31)
+
+    assert list(iter_dates(first, last))[:2] == [date(2023, 10, 10), date(2023, 10, 11)]
+    assert len(list(iter_dates(first, last))) == 21
+    assert list(iter_dates(first, last, "Monday")) == [date(2023, 10, 16), date(2023, 10, 23),
+                                                       date(2023, 10, 30)]
+    with pytest.raises(ValueError):
+        iter_dates(first, last, "Funday")
@@ -0,0 +1,466 @@
+"""Tests for the history store."""
+
+# pylint: skip-file
+
+import os
+from datetime import datetime
+from threading import Event, Thread
+from time import sleep
+
+import pytest
+
+from history import (HistoryStore, MmapHistoryStore, LogHistoryStore, HistoryIndex, open_history,
+                     format_entry, format_minute)
+
+
+def test_latest_returns_most_recent_first():
+    """Checks that entries are returned newest first."""
+
+    store = HistoryStore(10)
+    store.append("GET", "history")
+    store.append("POST", "weekday")
+
+    result = store.latest(5)
+
+    assert [x["route"] for x in result] == ["weekday", "history"]
+    assert result[0]["method"] == "POST"
+
+
+def test_formats_timestamps():
+    """Checks that timestamps are formatted to the minute."""
+
+    store = HistoryStore(10)
+    store.append("GET", "history", datetime(2023, 10, 9, 18, 36, 12).timestamp())
+
+    assert store.latest(1)[0]["at"] == "09/10/2023 18:36"
+
+
+def test_formats_each_minute_once():
+    """Checks that entries in the same minute reuse the formatted time."""
+
+    at = int(datetime(2023, 10, 9, 18, 36).timestamp())
+    format_minute.cache_clear()
+
+    first = format_entry("GET", at + 5, "history")
+    second = format_entry("GET", at + 50, "history")
+
+    assert first["at"] == second["at"] == "09/10/2023 18:36"
+    assert format_minute.cache_info().hits == 1
+
+
+def test_overwrites_oldest_when_full():
+    """Checks that the store never grows beyond its capacity."""
+
+    store = HistoryStore(3)
+    for i in range(7):
+        store.append("GET", f"route{i}")
+
+    assert len(store) == 3
+    assert [x["route"] for x in store.latest(10)] == ["route6", "route5", "route4"]
+
+
+def test_clear_empties_store():
+    """Checks that clearing removes all entries."""
+
+    store = HistoryStore(3)
+    store.append("GET", "history")
+    store.clear()
+
+    assert len(store) == 0
+    assert store.latest(5) == []
+
+
+@pytest.mark.parametrize("capacity", (0, -1))
+def test_rejects_invalid_capacity(capacity):
+    """Checks that a store must be able to hold at least one entry."""
+
+    with pytest.raises(ValueError):
+        HistoryStore(capacity)
+
+
+def test_concurrent_appends_are_not_lost():
+    """Checks that appends from several threads are all recorded."""
+
+    store = HistoryStore(10_000)
+
+    def worker():
+        for _ in range(1000):
+            store.append("GET", "history")
+
+    threads = [Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(store) == 4000
+
+
+def test_mmap_store_behaves_like_memory_store(tmp_path):
+    """Checks that the file-backed store keeps the same contract."""
+
+    store = MmapHistoryStore(str(tmp_path / "history.bin"), 3)
+    for i in range(5):
+        store.append("GET", f"route{i}")
+
+    assert len(store) == 3
+    assert [x["route"] for x in store.latest(2)] == ["route4", "route3"]
+
+    store.clear()
+    assert store.latest(5) == []
+    store.close()
+
+
+def test_mmap_store_is_shared_between_processes(tmp_path):
+    """Checks that entries written by another process are visible."""
+
+    path = str(tmp_path / "history.bin")
+    store = MmapHistoryStore(path, 10)
+
+    pid = os.fork()
+    if pid == 0:
+        MmapHistoryStore(path).append("POST", "weekday")
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+    assert store.latest(1)[0]["route"] == "weekday"
+    store.close()
+
+
+def test_log_store_reads_buffered_and_written_records(tmp_path):
+    """Checks that records are returned newest first before and after a flush."""
+
+    store = LogHistoryStore(str(tmp_path), flush_records=3, flush_interval=60)
+    for i in range(5):
+        store.append("GET", f"route{i}")
+
+    # A full group is written by the background flusher
+    for _ in range(500):
+        if list(tmp_path.glob("history-*.log")):
+            break
+        sleep(0.01)
+    assert len(list(tmp_path.glob("history-*.log"))) == 1
+    assert [x["route"] for x in store.latest(4)] == ["route4", "route3", "route2", "route1"]
+    store.close()
+
+
+def test_log_store_appends_while_writing(tmp_path):
+    """Checks that appends, even those that fill a group, do not wait for
+    a group being written."""
+
+    store = LogHistoryStore(str(tmp_path), flush_records=2, flush_interval=60)
+    store.append("GET", "route0")
+    with store._write_lock:
+        appender = Thread(target=store.append, args=("GET", "route1"))
+        appender.start()
+        appender.join(timeout=5)
+        assert not appender.is_alive()
+    store.flush()
+    assert [x["route"] for x in store.latest(5)] == ["route1", "route0"]
+    store.close()
+
+
+def test_log_store_reads_while_writing(tmp_path, monkeypatch):
+    """Checks that reads do not wait for a group being fsync'd, and read
+    the records in it once."""
+
+    store = LogHistoryStore(str(tmp_path), flush_records=100, flush_interval=60)
+    store.append("GET", "route0")
+    store.flush()
+    store.append("GET", "route1")
+    store.append("GET", "route2")
+    syncing, release = Event(), Event()
+    fsync = os.fsync
+
+    def slow_fsync(fd):
+        syncing.set()
+        release.wait(5)
+        fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", slow_fsync)
+    writer = Thread(target=store.flush)
+    writer.start()
+    try:
+        assert syncing.wait(5)
+        assert [x["route"] for x in store.latest(5)] == ["route2", "route1", "route0"]
+        assert writer.is_alive()
+    finally:
+        release.set()
+        writer.join()
+    assert [x["route"] for x in store.latest(5)] == ["route2", "route1", "route0"]
+    store.close()
+
+
+def test_log_store_survives_reopening(tmp_path):
+    """Checks that the history is still there after a restart."""
+
+    store = LogHistoryStore(str(tmp_path), flush_interval=60)
+    store.append("POST", "weekday")
+    store.close()
+
+    reopened = LogHistoryStore(str(tmp_path), flush_interval=60)
+
+    assert reopened.latest(5)[0]["route"] == "weekday"
+    reopened.close()
+
+
+def test_log_store_rotates_segments(tmp_path):
+    """Checks that reads span segment files."""
+
+    store = LogHistoryStore(str(tmp_path), flush_records=1, flush_interval=60,
+                            segment_records=2)
+    for i in range(5):
+        store.append("GET", f"route{i}")
+        store.flush()
+
+    assert len(list(tmp_path.glob("history-*.log"))) == 3
+    assert len(store) == 5
+    assert [x["route"] for x in store.latest(4)] == ["route4", "route3", "route2", "route1"]
+    store.close()
+
+
+def test_log_store_clear_removes_segments(tmp_path):
+    """Checks that clearing deletes the log."""
+
+    store = LogHistoryStore(str(tmp_path), flush_records=1, flush_interval=60)
+    store.append("GET", "history")
+    store.clear()
+
+    assert store.latest(5) == []
+    assert list(tmp_path.glob("history-*.log")) == []
+    store.close()
+
+
+def seed(store, at=1_696_870_800):
+    """Appends six requests to two routes, a minute apart."""
+
+    for i in range(6):
+        store.append("POST" if i % 3 else "GET", "between" if i % 2 else "weekday", at + 60 * i)
+
+
+def open_store(kind, tmp_path):
+    if kind == "memory":
+        return HistoryStore(100)
+    if kind == "mmap":
+        return MmapHistoryStore(str(tmp_path / "history.bin"), 100)
+    return LogHistoryStore(str(tmp_path), flush_interval=60, segment_records=4)
+
+
+@pytest.mark.parametrize("kind", ("memory", "mmap", "log"))
+def test_query_filters_by_route_and_method(kind, tmp_path):
+    """Checks that queries return only the entries for a route and method."""
+
+    store = open_store(kind, tmp_path)
+    seed(store)
+
+    entries, cursor = store.query(20, route="between")
+    assert [x["route"] for x in entries] == ["between"] * 3
+    assert cursor is None
+    entries, _ = store.query(20, route="between", method="POST")
+    assert [x["at"] for x in entries] == [format_minute(28_281_185), format_minute(28_281_181)]
+    entries, _ = store.query(20, method="GET")
+    assert len(entries) == 2
+    assert store.query(20, route="nowhere") == ([], None)
+    store.close()
+
+
+@pytest.mark.parametrize("kind", ("memory", "mmap", "log"))
+def test_query_filters_by_time(kind, tmp_path):
+    """Checks that since is inclusive and until is not."""
+
+    store = open_store(kind, tmp_path)
+    seed(store, 1000)
+
+    entries, _ = store.query(20, since=1060, until=1240)
+
+    assert [x["at"] for x in entries] == [format_minute(x) for x in (19, 18, 17)]
+    store.close()
+
+
+@pytest.mark.parametrize("kind", ("memory", "mmap", "log"))
+def test_query_pages_with_cursor(kind, tmp_path):
+    """Checks that following cursors returns every entry once, newest first."""
+
+    store = open_store(kind, tmp_path)
+    seed(store, 0)
+
+    pages, cursor = [], None
+    while True:
+        entries, cursor = store.query(4, before=cursor)
+        pages.append([x["at"] for x in entries])
+        if cursor is None:
+            break
+
+    assert pages == [[format_minute(x) for x in (5, 4, 3, 2)],
+                     [format_minute(x) for x in (1, 0)]]
+    store.close()
+
+
+@pytest.mark.parametrize("kind", ("memory", "mmap", "log"))
+def test_aggregate_counts_per_bucket(kind, tmp_path):
+    """Checks that counts are grouped by bucket, route and method."""
+
+    store = open_store(kind, tmp_path)
+    seed(store, 3600)
+
+    assert store.aggregate(3600, route="between") == [
+        {"at": format_minute(60), "method": "POST", "route": "between", "count": 2},
+        {"at": format_minute(60), "method": "GET", "route": "between", "count": 1}]
+    assert sum(x["count"] for x in store.aggregate(60, since=3660, until=3780)) == 2
+    store.close()
+
+
+def test_query_skips_overwritten_and_cleared_entries():
+    """Checks that the index forgets entries the ring buffer no longer holds."""
+
+    store = HistoryStore(3)
+    for i in range(10):
+        store.append("GET", f"route{i}", i * 60)
+
+    entries, _ = store.query(20)
+    assert [x["route"] for x in entries] == ["route9", "route8", "route7"]
+    assert store.query(20, route="route6") == ([], None)
+    assert [x["count"] for x in store.aggregate()] == [1, 1, 1]
+
+    store.clear()
+    assert store.query(20) == ([], None)
+    assert store.aggregate() == []
+
+
+def test_aggregate_skips_overwritten_entries_in_the_same_minute():
+    """Checks that overwritten entries still in the index are not counted."""
+
+    store = HistoryStore(3)
+    for i in range(5):
+        store.append("GET", "between" if i % 2 else "weekday", 0)
+
+    assert store.aggregate() == [
+        {"at": format_minute(0), "method": "GET", "route": "weekday", "count": 2},
+        {"at": format_minute(0), "method": "GET", "route": "between", "count": 1}]
+
+
+def test_queries_do_not_take_the_lock():
+    """Checks that queries and aggregates never wait for a writer."""
+
+    store = HistoryStore(3)
+    for i in range(10):
+        store.append("GET", f"route{i}", i * 60)
+    results = []
+
+    def read():
+        results.append(store.query(20)[0])
+        results.append(store.aggregate())
+
+    with store._lock:
+        reader = Thread(target=read)
+        reader.start()
+        reader.join(timeout=5)
+        assert not reader.is_alive()
+
+    assert [x["route"] for x in results[0]] == ["route9", "route8", "route7"]
+    assert len(results[1]) == 3
+
+
+def test_readers_keep_their_index_while_it_is_trimmed():
+    """Checks that queries and aggregates running alongside appends, and
+    the trims they make, do not fail."""
+
+    store = HistoryStore(50)
+    stop = False
+
+    def write():
+        i = 0
+        while not stop:
+            store.append("GET", f"route{i % 7}", i // 10)
+            i += 1
+
+    writer = Thread(target=write)
+    writer.start()
+    try:
+        for _ in range(200):
+            entries, _ = store.query(20)
+            assert len(entries) <= 20
+            assert all(x["count"] > 0 for x in store.aggregate())
+    finally:
+        stop = True
+        writer.join()
+
+
+def test_mmap_query_sees_other_processes(tmp_path):
+    """Checks that queries index entries written by another process."""
+
+    path = str(tmp_path / "history.bin")
+    store = MmapHistoryStore(path, 10)
+    store.append("GET", "history")
+    store.query(5)
+
+    pid = os.fork()
+    if pid == 0:
+        MmapHistoryStore(path).append("POST", "weekday")
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+    assert store.query(5, method="POST")[0][0]["route"] == "weekday"
+    store.close()
+
+
+def test_log_query_after_clear_and_reopening(tmp_path):
+    """Checks that the log index starts again after the log is cleared."""
+
+    store = LogHistoryStore(str(tmp_path), flush_interval=60)
+    seed(store)
+    assert len(store.query(20)[0]) == 6
+    store.clear()
+    store.append("GET", "index")
+    store.close()
+
+    reopened = LogHistoryStore(str(tmp_path), flush_interval=60)
+
+    assert [x["route"] for x in reopened.query(20)[0]] == ["index"]
+    reopened.close()
+
+
+def test_log_query_after_clear(tmp_path):
+    """Checks that clearing the log, here or in another process, empties
+    the index even when the new first segment reuses the old one's inode."""
+
+    store = LogHistoryStore(str(tmp_path), flush_interval=60)
+    seed(store)
+    assert len(store.query(20)[0]) == 6
+
+    store.clear()
+    assert store.query(20, route="between") == ([], None)
+    assert store.aggregate() == []
+
+    store.append("GET", "index")
+    assert len(store.query(20)[0]) == 1
+
+    pid = os.fork()
+    if pid == 0:
+        other = LogHistoryStore(str(tmp_path), flush_interval=60)
+        other.clear()
+        other.append("POST", "weekday")
+        other.close()
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+    assert [(x["method"], x["route"]) for x in store.query(20)[0]] == [("POST", "weekday")]
+    store.close()
+
+
+def test_index_starts_again_after_a_gap():
+    """Checks that skipped sequence numbers drop what was indexed."""
+
+    index = HistoryIndex()
+    index.add(0, 0, "GET", "index")
+    index.add(5, 60, "GET", "index")
+
+    assert index.first == 5
+    assert [x["at"] for x in index.find(5)[0]] == [format_minute(1)]
+
+
+def test_open_history_rejects_unknown_backend():
+    """Checks that an unknown backend name is rejected."""
+
+    with pytest.raises(ValueError):
+        open_history("redis")
@@ -0,0 +1,107 @@
+"""Tests for the JSON provider"""
+
+# pylint: skip-file
+
+from datetime import date, datetime, timezone
+
+import pytest
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import json_provider
+from app import create_app
+from json_provider import init_json
+
+BODIES = (
+    {"days": 6},
+    {"weekday": "Saturday"},
+    {"age": 24, "unit": "years"},
+    {"error": "Missing required data."},
+    [{"days": 6}, {"error": "Unable to convert value to datetime."}],
+    {"history": [{"method": "POST", "route": "between",
+                  "time": "Sat, 01 Jan 2000 00:00:00 GMT"}], "next": None},
+    {"date": date(2000, 1, 1), "time": datetime(2000, 1, 1, 12, 30, tzinfo=timezone.utc)},
+    {"b": 1, "a": [1.5, True, None, "x"]},
+)
+
+
+@pytest.fixture
+def providers():
+    pytest.importorskip("orjson")
+    app = Flask(__name__)
+    return json_provider.FastJSONProvider(app), DefaultJSONProvider(app), app
+
+
+@pytest.mark.parametrize("body", BODIES)
+def test_dumps_matches_default(body, providers):
+    """Checks that bodies, including dates, are written as Flask writes them."""
+
+    fast, default, _ = providers
+
+    assert fast.loads(fast.dumps(body)) == default.loads(default.dumps(body))
+
+
+@pytest.mark.parametrize("body", BODIES)
+def test_loads_matches_default(body, providers):
+    """Checks that bodies are read as Flask reads them."""
+
+    fast, default, _ = providers
+    text = default.dumps(body)
+
+    assert fast.loads(text) == default.loads(text)
+    assert fast.loads(text.encode()) == default.loads(text)
+
+
+@pytest.mark.parametrize("body", BODIES)
+def test_response_matches_default(body, providers):
+    """Checks that responses have the same body and type as Flask's."""
+
+    fast, default, app = providers
+    with app.app_context():
+        expected = default.response(body)
+        result = fast.response(body)
+
+    assert result.get_data() == expected.get_data()
+    assert result.mimetype == expected.mimetype
+
+
+def test_non_ascii_response_is_utf8(providers):
+    """Checks that text outside ASCII is written as UTF-8 rather than
+    escaped, and reads back the same."""
+
+    fast, default, app = providers
+    with app.app_context():
+        expected = default.response({"zone": "América/São_Paulo"})
+        result = fast.response({"zone": "América/São_Paulo"})
+
+    assert result.get_data() == '{"zone":"América/São_Paulo"}\n'.encode()
+    assert default.loads(result.get_data()) == default.loads(expected.get_data())
+
+
+def test_init_uses_fast_provider():
+    """Checks that the fast provider is used when orjson is installed."""
+
+    pytest.importorskip("orjson")
+
+    assert isinstance(create_app({}).json, json_provider.FastJSONProvider)
+
+
+def test_stdlib_provider_can_be_chosen():
+    """Checks that JSON_PROVIDER=stdlib keeps Flask's own provider."""
+
+    app = create_app({"JSON_PROVIDER": "stdlib"})
+
+    assert isinstance(app.json, DefaultJSONProvider)
+    assert not isinstance(app.json, json_provider.FastJSONProvider)
+    assert app.test_client().post("/between", json={"first": "1.1.2000",
+                                                      "last": "7.1.2000"}).json == {"days": 6}
+
+
+def test_falls_back_without_orjson(monkeypatch):
+    """Checks that Flask's own provider is kept when orjson is missing."""
+
+    monkeypatch.setattr(json_provider, "orjson", None)
+    app = Flask(__name__)
+    init_json(app)
+
+    assert type(app.json) is DefaultJSONProvider
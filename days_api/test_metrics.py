@@ -0,0 +1,44 @@
+"""Tests for the request metrics."""
+
+# pylint: skip-file
+
+from metrics import Metrics
+
+
+def test_observe_counts_requests_by_status():
+    """Checks that requests are counted per route and status."""
+
+    metrics = Metrics((0.1, 1.0))
+    metrics.observe("weekday", 200, 0.05)
+    metrics.observe("weekday", 400, 0.5)
+    metrics.observe("between", 200, 2.0)
+
+    assert metrics.routes["weekday"].statuses == {200: 1, 400: 1}
+    assert metrics.routes["weekday"].buckets == [1, 1, 0]
+    assert metrics.routes["between"].buckets == [0, 0, 1]
+
+
+def test_render_uses_cumulative_buckets():
+    """Checks that the histogram is rendered in the Prometheus format."""
+
+    metrics = Metrics((0.1, 1.0))
+    metrics.observe("weekday", 200, 0.05)
+    metrics.observe("weekday", 200, 0.5)
+
+    text = metrics.render({"days_api_parse_cache_hits_total": 3})
+
+    assert 'days_api_requests_total{route="weekday",status="200"} 2' in text
+    assert 'days_api_request_duration_seconds_bucket{route="weekday",le="0.1"} 1' in text
+    assert 'days_api_request_duration_seconds_bucket{route="weekday",le="+Inf"} 2' in text
+    assert 'days_api_request_duration_seconds_count{route="weekday"} 2' in text
+    assert "days_api_parse_cache_hits_total 3" in text
+
+
+def test_clear_removes_routes():
+    """Checks that clearing forgets all requests."""
+
+    metrics = Metrics()
+    metrics.observe("index", 200, 0.001)
+    metrics.clear()
+
+    assert metrics.routes == {}
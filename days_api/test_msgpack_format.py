@@ -0,0 +1,56 @@
+"""Tests for the MessagePack encoder and decoder."""
+
+# pylint: skip-file
+
+from datetime import date, datetime, timezone
+
+import pytest
+
+from msgpack_format import packb, unpackb
+
+
+@pytest.mark.parametrize("value", (None, True, False, 0, 127, 128, 65536, 2 ** 64 - 1,
+                                   -1, -32, -33, -129, -2 ** 63, 1.5, "", "a" * 31, "a" * 32,
+                                   "é" * 300, b"\x00" * 300, [], [1] * 15, [1] * 70000,
+                                   {"a": [{"b": None}]}, {str(n): n for n in range(20)},
+                                   datetime(2023, 10, 9, tzinfo=timezone.utc),
+                                   datetime(2023, 10, 9, 1, 2, 3, 456000, tzinfo=timezone.utc),
+                                   datetime(1900, 1, 1, tzinfo=timezone.utc)))
+def test_round_trips(value):
+    """Checks that values decode to what was encoded."""
+
+    assert unpackb(packb(value)) == value
+
+
+@pytest.mark.parametrize("value, out", ((0, "00"), (-1, "ff"), (200, "ccc8"), (-200, "d1ff38"),
+                                        ({"days": 2}, "81a46461797302"),
+                                        ([True, None], "92c3c0")))
+def test_encodes_standard_bytes(value, out):
+    """Checks that values are encoded in the standard's shortest forms."""
+
+    assert packb(value).hex() == out
+
+
+def test_encodes_dates_as_fixed_width_timestamps():
+    """Checks that dates are encoded as 32-bit timestamps."""
+
+    encoded = packb(date(2023, 10, 9))
+
+    assert encoded.hex() == "d6ff65234280"
+    assert unpackb(encoded) == datetime(2023, 10, 9, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("data", (b"", b"\xc1", b"\x92\x01", b"\x01\x02", b"\xdd\xff\xff\xff\xff",
+                                  b"\xd4\x05\x00", b"\x81\x90\x01", b"\xa2\xff\xfe", b"\x91" * 1000))
+def test_rejects_invalid_data(data):
+    """Checks that malformed, truncated or unsupported data is rejected."""
+
+    with pytest.raises(ValueError):
+        unpackb(data)
+
+
+def test_rejects_unsupported_types():
+    """Checks that values with no MessagePack encoding are rejected."""
+
+    with pytest.raises(TypeError):
+        packb({1, 2})
@@ -0,0 +1,138 @@
+"""Tests for rate limiting."""
+
+# pylint: skip-file
+
+import pytest
+from flask import Flask
+
+from rate_limit import (TokenBuckets, SharedTokenBuckets, init_rate_limits, parse_limits,
+                        parse_api_keys)
+
+
+class FakeClock:
+    """A clock that only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_allows_bursts_then_refills():
+    """Checks that a bucket empties and refills at its rate."""
+
+    clock = FakeClock()
+    buckets = TokenBuckets(rate=1, burst=2, clock=clock)
+
+    assert buckets.take("a") == 0
+    assert buckets.take("a") == 0
+    assert buckets.take("a") == pytest.approx(1)
+    assert buckets.take("b") == 0
+
+    clock.now += 1
+    assert buckets.take("a") == 0
+
+
+def test_drops_idle_buckets():
+    """Checks that buckets are forgotten once they are idle."""
+
+    clock = FakeClock()
+    buckets = TokenBuckets(rate=1, burst=2, clock=clock)
+    buckets.take("a")
+
+    clock.now += 1000
+    buckets.take("b")
+
+    assert len(buckets) == 1
+
+
+def test_drops_least_recently_used_when_full():
+    """Checks that the number of buckets is capped."""
+
+    clock = FakeClock()
+    buckets = TokenBuckets(rate=1, burst=1, clock=clock, max_buckets=2)
+    buckets.take("a")
+    buckets.take("b")
+    buckets.take("a")
+    buckets.take("c")
+
+    assert len(buckets) == 2
+    assert buckets.take("a") > 0
+    assert buckets.take("b") == 0
+
+
+def test_shared_buckets_are_shared(tmp_path):
+    """Checks that two processes' views of a file share their buckets."""
+
+    clock = FakeClock()
+    path = str(tmp_path / "limits")
+    first = SharedTokenBuckets(1, 1, path, slots=16, clock=clock)
+    second = SharedTokenBuckets(1, 1, path, slots=16, clock=clock)
+
+    assert first.take("a") == 0
+    assert second.take("a") == pytest.approx(1)
+    assert second.take("b") == 0
+
+
+@pytest.mark.parametrize("spec, out", (("between=10/2", {"between": (5.0, 10.0)}),
+                                       ("between=1/1, default=60/60",
+                                        {"between": (1.0, 1.0), "default": (1.0, 60.0)}),
+                                       ("", {})))
+def test_parse_limits(spec, out):
+    """Checks that limit specs are parsed."""
+
+    assert parse_limits(spec) == out
+
+
+@pytest.mark.parametrize("spec", ("between", "between=1", "between=a/1", "between=10/0",
+                                  "between=0/60", "between=-1/60", "between=10/-60",
+                                  "between=10/inf", "between=10/nan"))
+def test_parse_limits_rejects_bad_specs(spec):
+    """Checks that invalid limit specs are rejected."""
+
+    with pytest.raises(ValueError):
+        parse_limits(spec)
+
+
+def test_throttled_requests_get_429():
+    """Checks that requests over the limit are rejected with Retry-After."""
+
+    app = Flask(__name__)
+    init_rate_limits(app, {"work": (0.5, 1)}, api_keys=frozenset({"key"}))
+
+    @app.get("/work")
+    def work():
+        return {}
+
+    @app.get("/other")
+    def other():
+        return {}
+
+    client = app.test_client()
+
+    assert client.get("/work").status_code == 200
+    result = client.get("/work")
+    assert result.status_code == 429
+    assert result.json == {"error": "Too many requests."}
+    assert result.headers["Retry-After"] == "2"
+    assert client.get("/work", headers={"X-API-Key": "key"}).status_code == 200
+    assert client.get("/other").status_code == 200
+
+
+def test_unknown_api_keys_are_limited_by_address():
+    """Checks that made-up API keys cannot be used to dodge the limit."""
+
+    app = Flask(__name__)
+    init_rate_limits(app, {"work": (0.5, 1)}, api_keys=parse_api_keys("key, other,"))
+
+    @app.get("/work")
+    def work():
+        return {}
+
+    client = app.test_client()
+
+    assert client.get("/work", headers={"X-API-Key": "0"}).status_code == 200
+    assert [client.get("/work", headers={"X-API-Key": str(n)}).status_code
+            for n in range(1, 5)] == [429] * 4
+    assert client.get("/work", headers={"X-API-Key": "other"}).status_code == 200
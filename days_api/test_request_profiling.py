@@ -0,0 +1,119 @@
+"""Tests for request profiling."""
+
+# pylint: skip-file
+
+import marshal
+
+import pytest
+from flask import Flask
+
+from request_profiling import ProfileStore, init_profiling, collapse
+
+ASK = {"X-Profile": "1", "X-Profile-Token": "secret"}
+
+
+@pytest.fixture
+def profiled():
+    """Returns a test client for an app with profiling enabled, and its store."""
+    app = Flask(__name__)
+    store = ProfileStore(2)
+    init_profiling(app, store, token="secret")
+
+    @app.get("/work")
+    def work():
+        return {"total": sum(range(1000))}
+
+    return app.test_client(), store
+
+
+def test_only_profiles_requests_with_header(profiled):
+    """Checks that requests are profiled only when asked."""
+
+    client, store = profiled
+    client.get("/work")
+    client.get("/work", headers=ASK)
+
+    assert len(store) == 1
+
+
+@pytest.mark.parametrize("token", (None, "wrong"))
+def test_ignores_header_without_token(token, profiled):
+    """Checks that only clients with the token can ask for a profile."""
+
+    client, store = profiled
+    headers = {"X-Profile": "1"} if token is None else {**ASK, "X-Profile-Token": token}
+    client.get("/work", headers=headers)
+
+    assert len(store) == 0
+
+
+def test_only_samples_without_a_token():
+    """Checks that without a configured token the header is ignored and
+    the profiles are not served, but sampling still works."""
+
+    app = Flask(__name__)
+    store = ProfileStore(2)
+    init_profiling(app, store)
+    app.get("/work")(lambda: {})
+    client = app.test_client()
+
+    client.get("/work", headers={"X-Profile": "1"})
+    assert len(store) == 0
+    assert client.get("/debug/profiles").status_code == 404
+    assert client.delete("/debug/profiles").status_code == 404
+
+    sampled = Flask(__name__)
+    init_profiling(sampled, store, sample_rate=1)
+    sampled.get("/work")(lambda: {})
+    sampled.test_client().get("/work")
+    assert len(store) == 1
+
+
+def test_store_is_bounded(profiled):
+    """Checks that the oldest profiles are dropped."""
+
+    client, store = profiled
+    for _ in range(5):
+        client.get("/work", headers=ASK)
+
+    assert len(store) == 2
+
+
+@pytest.mark.parametrize("output, mimetype", (("text", "text/plain"),
+                                              ("collapsed", "text/plain"),
+                                              ("prof", "application/octet-stream")))
+def test_dumps_profiles(output, mimetype, profiled):
+    """Checks that profiles can be dumped in each format."""
+
+    client, _ = profiled
+    client.get("/work", headers=ASK)
+
+    result = client.get(f"/debug/profiles?format={output}",
+                        headers={"X-Profile-Token": "secret"})
+
+    assert result.status_code == 200
+    assert result.mimetype == mimetype
+    if output == "prof":
+        assert marshal.loads(result.data)
+
+
+def test_requires_token(profiled):
+    """Checks that profiles are only served with the right token."""
+
+    client, _ = profiled
+
+    assert client.get("/debug/profiles").status_code == 403
+    assert client.delete("/debug/profiles").status_code == 403
+
+
+def test_collapse_attributes_time_to_stacks():
+    """Checks that self time is attributed to each call stack."""
+
+    main = ("app.py", 1, "main")
+    helper = ("app.py", 5, "helper")
+    stats = {
+        main: (1, 1, 0.001, 0.003, {}),
+        helper: (1, 1, 0.002, 0.002, {main: (1, 1, 0.002, 0.002)}),
+    }
+
+    assert collapse(stats) == "app.py:1:main 1000\napp.py:1:main;app.py:5:helper 2000\n"
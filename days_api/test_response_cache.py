@@ -0,0 +1,49 @@
+"""Tests for the response cache."""
+
+# pylint: skip-file
+
+from time import time
+
+from response_cache import ResponseCache
+
+
+def test_get_returns_cached_body():
+    """Checks that a cached body is returned with a stable ETag."""
+
+    cache = ResponseCache(2)
+    entry = cache.put(("weekday", "09.10.2023"), b'{"weekday": "Monday"}')
+
+    assert cache.get(("weekday", "09.10.2023")) is entry
+    assert entry.etag == ResponseCache().put(("x",), b'{"weekday": "Monday"}').etag
+
+
+def test_evicts_least_recently_used():
+    """Checks that the cache never grows beyond its size."""
+
+    cache = ResponseCache(2)
+    cache.put(("a",), b"1")
+    cache.put(("b",), b"2")
+    cache.get(("a",))
+    cache.put(("c",), b"3")
+
+    assert len(cache) == 2
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) is not None
+
+
+def test_expired_entries_are_missing():
+    """Checks that entries are not returned after they expire."""
+
+    cache = ResponseCache()
+    cache.put(("current_age", "2000-01-01"), b"{}", time() - 1)
+
+    assert cache.get(("current_age", "2000-01-01")) is None
+
+
+def test_disabled_cache_stores_nothing():
+    """Checks that a cache of size zero never keeps entries."""
+
+    cache = ResponseCache(0)
+    cache.put(("a",), b"1")
+
+    assert cache.get(("a",)) is None
@@ -0,0 +1,106 @@
+"""Tests for the pre-forking server"""
+
+# pylint: skip-file
+
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+from urllib.request import urlopen
+
+import pytest
+
+TIMEOUT = 10
+
+
+def wait_for(check, timeout=TIMEOUT):
+    """Returns the first true result of check, polling until the timeout."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = check()
+        if result:
+            return result
+        time.sleep(0.05)
+    raise AssertionError("Timed out waiting.")
+
+
+def workers(pid):
+    """Returns the process ids of the children of a process."""
+    children = set()
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            fields = stat.read_text().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid and fields[0] != "Z":
+            children.add(int(stat.parent.name))
+    return children
+
+
+@pytest.fixture
+def server(tmp_path):
+    """Starts serve.main with two workers on a free port, and returns the
+    master process and a function that fetches a path."""
+    log = tmp_path / "serve.log"
+    with open(log, "wb") as errors:
+        master = subprocess.Popen(
+            [sys.executable, "-c",
+             "import serve; serve.main(['--host', '127.0.0.1', '--port', '0', '--workers', '2'])"],
+            cwd=Path(__file__).parent, stderr=errors,
+            env={**os.environ, "HISTORY_BACKEND": "memory"})
+    port = wait_for(lambda: re.search(r"Serving on 127\.0\.0\.1:(\d+)", log.read_text()))[1]
+
+    def get(path="/"):
+        with urlopen(f"http://127.0.0.1:{port}{path}", timeout=TIMEOUT) as response:
+            return response.status
+
+    wait_for(lambda: len(workers(master.pid)) == 2)
+    yield master, get
+    if master.poll() is None:
+        master.kill()
+        master.wait()
+    for pid in workers(master.pid):
+        os.kill(pid, signal.SIGKILL)
+
+
+def test_restarts_crashed_workers(server):
+    """Checks that a worker that dies is replaced."""
+
+    master, get = server
+    assert get() == 200
+    dead = min(workers(master.pid))
+
+    os.kill(dead, signal.SIGKILL)
+
+    wait_for(lambda: len(workers(master.pid) - {dead}) == 2)
+    assert get() == 200
+
+
+def test_reload_replaces_workers_and_keeps_serving(server):
+    """Checks that SIGHUP replaces every worker while requests are answered."""
+
+    master, get = server
+    old = workers(master.pid)
+
+    master.send_signal(signal.SIGHUP)
+
+    deadline = time.monotonic() + TIMEOUT
+    while time.monotonic() < deadline and workers(master.pid) & old:
+        assert get() == 200
+    assert not workers(master.pid) & old
+    assert get() == 200
+
+
+def test_stop_drains_workers_and_exits(server):
+    """Checks that SIGTERM stops the workers and then the master."""
+
+    master, get = server
+    assert get() == 200
+
+    master.send_signal(signal.SIGTERM)
+
+    assert master.wait(TIMEOUT) == 0
+    assert not workers(master.pid)
@@ -0,0 +1,72 @@
+"""Tests for sharing the results of identical concurrent requests."""
+
+# pylint: skip-file
+
+from threading import Thread
+
+from single_flight import SingleFlight
+
+
+def test_first_caller_leads():
+    """Checks that only the first caller for a key leads its flight."""
+
+    flights = SingleFlight()
+
+    first, leader = flights.join("key")
+    second, follower = flights.join("key")
+    _, other = flights.join("other")
+
+    assert leader and not follower and other
+    assert first is second
+    assert flights.leaders == 2
+
+
+def test_waiting_callers_share_the_result():
+    """Checks that callers waiting on a flight get its result when it lands."""
+
+    flights = SingleFlight()
+    flight, _ = flights.join("key")
+    results = []
+    waiters = [Thread(target=lambda: results.append(flights.wait(flights.join("key")[0])))
+               for _ in range(3)]
+    for waiter in waiters:
+        waiter.start()
+
+    flights.land("key", flight, "result")
+    for waiter in waiters:
+        waiter.join()
+
+    assert results == ["result"] * 3
+    assert flights.coalesced == 3
+    assert len(flights) == 0
+
+
+def test_failed_flights_share_nothing():
+    """Checks that waiting callers get no result from a flight that failed."""
+
+    flights = SingleFlight()
+    flight, _ = flights.join("key")
+    flights.land("key", flight)
+
+    assert flights.wait(flight) is None
+    assert flights.coalesced == 0
+
+
+def test_waiting_times_out():
+    """Checks that callers stop waiting on a flight that takes too long."""
+
+    flights = SingleFlight(timeout=0.01)
+    flight, _ = flights.join("key")
+
+    assert flights.wait(flight) is None
+    assert flights.join("key")[0] is flight
+
+
+def test_new_flight_starts_after_landing():
+    """Checks that a key gets a new flight once the last has landed."""
+
+    flights = SingleFlight()
+    flight, _ = flights.join("key")
+    flights.land("key", flight, "result")
+
+    assert flights.join("key") != (flight, False)
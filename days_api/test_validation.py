@@ -0,0 +1,78 @@
+"""Tests for the request schemas."""
+
+# pylint: skip-file
+
+from datetime import datetime
+
+import pytest
+
+from validation import (Field, Schema, BETWEEN, ADD_BUSINESS_DAYS, HISTORY, CURRENT_AGE,
+                        is_date, MAX_DATE_LENGTH)
+
+
+@pytest.mark.parametrize("data", (None, [], "first", {"first": "12.1.2000"}))
+def test_reports_missing_data(data):
+    """Checks that data that is not an object, or lacks a field, is missing."""
+
+    assert BETWEEN.validate(data) == "Missing required data."
+
+
+def test_accepts_valid_data():
+    """Checks that data with every field passing its check is valid."""
+
+    assert BETWEEN.validate({"first": "12.1.2000", "last": "09.10.2023",
+                             "tz": "Europe/London", "extra": None}) is None
+
+
+@pytest.mark.parametrize("value, valid", (("09.10.2023", True), (1696809600, True), (1.5, True),
+                                          (datetime(2023, 10, 9), True), ("9" * MAX_DATE_LENGTH, True),
+                                          ("9" * (MAX_DATE_LENGTH + 1), False), (True, False),
+                                          (None, False), ([1], False), ({"a": 1}, False)))
+def test_checks_date_types(value, valid):
+    """Checks that only values that could be dates pass, without parsing them."""
+
+    assert is_date(value) is valid
+
+
+def test_reports_first_failing_field():
+    """Checks that fields are checked in order, after the missing check."""
+
+    assert BETWEEN.validate({"first": [], "last": "x", "tz": 5}) == "Unknown time zone."
+    assert BETWEEN.validate({"first": [], "last": {}}) == "Unable to convert value to datetime."
+    assert ADD_BUSINESS_DAYS.validate({"date": [], "days": "5"}).startswith("Days must be")
+
+
+@pytest.mark.parametrize("days, valid", ((0, True), (-100_000, True), (100_000, True),
+                                         (100_001, False), (True, False), ("5", False), (1.0, False)))
+def test_checks_business_days(days, valid):
+    """Checks that days must be a whole number in range."""
+
+    assert (ADD_BUSINESS_DAYS.validate({"date": "09.10.2023", "days": days}) is None) is valid
+
+
+@pytest.mark.parametrize("number, valid", (("1", True), ("20", True), ("05", True), ("0", False),
+                                           ("21", False), ("²", False), ("-1", False), ("", False)))
+def test_checks_history_number(number, valid):
+    """Checks that the history number must be a whole number from 1 to 20."""
+
+    assert (HISTORY.validate({"number": number}) is None) is valid
+    assert HISTORY.validate({}) is None
+
+
+def test_blank_fields_count_as_missing():
+    """Checks that blank values of fields that must be filled are missing."""
+
+    assert CURRENT_AGE.validate({"date": ""}) == "Date parameter is required."
+    assert CURRENT_AGE.validate({"date": "x" * 100}) == "Value for data parameter is invalid."
+    assert Schema(Field("a", blank=False), missing="Gone.").validate({"a": 0}) == "Gone."
+
+
+@pytest.mark.parametrize("args, valid", (({"route": "between", "method": "post"}, True),
+                                         ({"since": "1696870800", "until": "2023-10-09T18:00"}, True),
+                                         ({"cursor": "12", "aggregate": "minute"}, True),
+                                         ({"route": ""}, False), ({"since": "last week"}, False),
+                                         ({"cursor": "1" * 19}, False), ({"aggregate": "week"}, False)))
+def test_checks_history_filters(args, valid):
+    """Checks the history query parameters."""
+
+    assert (HISTORY.validate(args) is None) is valid
@@ -0,0 +1,154 @@
+"""This file checks request data against schemas before any work is done.
+
+A schema lists the fields a request needs and a check for each value.
+Each is compiled once, when defined, into a set of required names,
+tested in one set operation, and a tuple of only the checks its fields
+need, so malformed requests are turned away before their values are
+parsed, copied or cached."""
+
+import re
+from datetime import datetime
+
+from history import BUCKETS
+
+MISSING_DATA = "Missing required data."
+INVALID_DATE = "Unable to convert value to datetime."
+UNKNOWN_ZONE = "Unknown time zone."
+UNKNOWN_CALENDAR = "Unknown holiday calendar."
+INVALID_TIME = "Since and until must be ISO 8601 times or epoch seconds."
+# Longer than any date in a recognised format, with room for whitespace
+MAX_DATE_LENGTH = 64
+# Longer than any IANA time zone name
+MAX_ZONE_LENGTH = 64
+# Numbers are sent as epoch seconds, and datetimes as MessagePack timestamps
+DATE_TYPES = frozenset((str, int, float, datetime))
+MAX_BUSINESS_DAYS = 100_000
+HISTORY_NUMBER = re.compile(r"0*(?:[1-9]|1[0-9]|20)")
+HTTP_METHOD = re.compile(r"[A-Za-z]{1,16}")
+TIME = re.compile(r"-?[0-9]{1,12}|[0-9]{4}-[0-9]{2}-[0-9]{2}[0-9T:.,+Z -]{0,24}")
+CURSOR = re.compile(r"[0-9]{1,18}")
+
+
+def is_date(value) -> bool:
+    """Checks that a value could be a date, without parsing it."""
+    kind = type(value)
+    return kind in DATE_TYPES and (kind is not str or len(value) <= MAX_DATE_LENGTH)
+
+
+def is_zone(value) -> bool:
+    """Checks that a value could be the name of a time zone."""
+    return value is None or (isinstance(value, str) and len(value) <= MAX_ZONE_LENGTH)
+
+
+def is_calendar(value) -> bool:
+    """Checks that a value could be the name of a holiday calendar."""
+    return value is None or (isinstance(value, str) and len(value) <= MAX_ZONE_LENGTH)
+
+
+def is_business_days(value) -> bool:
+    """Checks that a value is a whole number of at most MAX_BUSINESS_DAYS,
+    and not a string or boolean that would share its cache entry."""
+    return type(value) is int and abs(value) <= MAX_BUSINESS_DAYS  # pylint: disable = unidiomatic-typecheck
+
+
+def is_history_number(value) -> bool:
+    """Checks that a value is a whole number from 1 to 20."""
+    return HISTORY_NUMBER.fullmatch(value) is not None
+
+
+def is_route_name(value) -> bool:
+    """Checks that a value could be the name of a route."""
+    return isinstance(value, str) and 0 < len(value) <= MAX_ZONE_LENGTH
+
+
+def is_method(value) -> bool:
+    """Checks that a value could be an HTTP method."""
+    return HTTP_METHOD.fullmatch(value) is not None
+
+
+def is_time(value) -> bool:
+    """Checks that a value looks like epoch seconds or an ISO 8601 time."""
+    return TIME.fullmatch(value) is not None
+
+
+def is_cursor(value) -> bool:
+    """Checks that a value could be a history cursor."""
+    return CURSOR.fullmatch(value) is not None
+
+
+class Field:  # pylint: disable = too-few-public-methods
+    """A field of a request, and the check its value must pass.
+
+    Blank values, such as empty strings, count as missing unless
+    blank is True."""
+
+    __slots__ = ("name", "check", "error", "required", "blank")
+
+    def __init__(self, name: str, check=None, error: str = MISSING_DATA,  # pylint: disable = too-many-arguments
+                 required: bool = True, blank: bool = True):
+        self.name = name
+        self.check = check
+        self.error = error
+        self.required = required
+        self.blank = blank
+
+
+class Schema:  # pylint: disable = too-few-public-methods
+    """The fields a request must have, compiled into a validator.
+
+    Missing fields are reported first, with the missing message, and then
+    the first field, in order, whose value fails its check."""
+
+    def __init__(self, *fields: Field, missing: str = MISSING_DATA):
+        self.missing = missing
+        self.required = frozenset(field.name for field in fields if field.required)
+        self._filled = tuple(field.name for field in fields if not field.blank)
+        self._checks = tuple((field.name, field.check, field.error)
+                             for field in fields if field.check is not None)
+
+    def validate(self, data) -> str | None:
+        """Returns the error message for the first problem with data, an
+        object of fields, or None if it has none."""
+        if not isinstance(data, dict) or not self.required <= data.keys():
+            return self.missing
+        for name in self._filled:
+            if not data[name]:
+                return self.missing
+        for name, check, error in self._checks:
+            if name in data and not check(data[name]):
+                return error
+        return None
+
+
+BETWEEN = Schema(Field("tz", is_zone, UNKNOWN_ZONE, required=False),
+                 Field("first", is_date, INVALID_DATE),
+                 Field("last", is_date, INVALID_DATE))
+WEEKDAY = Schema(Field("tz", is_zone, UNKNOWN_ZONE, required=False),
+                 Field("date", is_date, INVALID_DATE))
+# Batch items take their time zone from the query string
+BETWEEN_ITEM = Schema(Field("first", is_date, INVALID_DATE), Field("last", is_date, INVALID_DATE))
+WEEKDAY_ITEM = Schema(Field("date", is_date, INVALID_DATE))
+BUSINESS_DAYS = Schema(Field("tz", is_zone, UNKNOWN_ZONE, required=False),
+                       Field("calendar", is_calendar, UNKNOWN_CALENDAR, required=False),
+                       Field("first", is_date, INVALID_DATE),
+                       Field("last", is_date, INVALID_DATE))
+ADD_BUSINESS_DAYS = Schema(Field("days", is_business_days, "Days must be an integer between "
+                                 f"-{MAX_BUSINESS_DAYS} and {MAX_BUSINESS_DAYS}."),
+                           Field("tz", is_zone, UNKNOWN_ZONE, required=False),
+                           Field("calendar", is_calendar, UNKNOWN_CALENDAR, required=False),
+                           Field("date", is_date, INVALID_DATE))
+HISTORY = Schema(Field("number", is_history_number,
+                       "Number must be an integer between 1 and 20.", required=False),
+                 Field("route", is_route_name,
+                       "Route must be the name of a route, such as between.", required=False),
+                 Field("method", is_method, "Method must be an HTTP method, such as POST.",
+                       required=False),
+                 Field("since", is_time, INVALID_TIME, required=False),
+                 Field("until", is_time, INVALID_TIME, required=False),
+                 Field("cursor", is_cursor, "Cursor must be one given by a previous page.",
+                       required=False),
+                 Field("aggregate", BUCKETS.__contains__,
+                       f"Aggregate must be one of {', '.join(BUCKETS)}.", required=False))
+CURRENT_AGE = Schema(Field("tz", is_zone, UNKNOWN_ZONE, required=False),
+                     Field("date", is_date, "Value for data parameter is invalid.", blank=False),
+                     missing="Date parameter is required.")